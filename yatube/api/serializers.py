@@ -0,0 +1,176 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Сколько байт JSON копится перед отправкой очередной части ответа
+CHUNK_SIZE = 8192
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class Field:
+    '''Поле ответа: колонки модели, которые нужно прочитать,
+    и функция, достающая значение из объекта'''
+
+    def __init__(self, *columns, value=None):
+        self.columns = columns
+        self.value = value or (lambda obj: getattr(obj, columns[0]))
+
+
+class Relation:
+    '''Связанный объект: без ?include= отдается его id, с ним - объект,
+    прочитанный тем же запросом через select_related'''
+
+    def __init__(self, name, serializer):
+        self.name = name
+        self.serializer = serializer
+
+
+class Serializer:
+    '''Превращает объекты модели в словари для JSON.
+
+    Набор полей задается ?fields=, вложенные объекты - ?include=, а
+    prepare() оставляет в запросе только нужные для этого колонки.
+    '''
+    fields = {}
+    relations = {}
+
+    def __init__(self, fields=None, include=()):
+        names = list(fields or (*self.fields, *self.relations))
+        unknown = set(names) - set(self.fields) - set(self.relations)
+        if unknown:
+            raise ValueError(
+                f'Неизвестные поля: {", ".join(sorted(unknown))}'
+            )
+        unknown = set(include) - set(self.relations)
+        if unknown:
+            raise ValueError(
+                f'Нельзя встроить: {", ".join(sorted(unknown))}'
+            )
+        self.names = names
+        self.include = {
+            name: self.relations[name].serializer()
+            for name in include if name in names
+        }
+
+    @classmethod
+    def from_request(cls, request):
+        '''Сериализатор по параметрам ?fields= и ?include= запроса'''
+        def split(parameter):
+            value = request.GET.get(parameter, '')
+            return [name for name in value.split(',') if name]
+
+        return cls(split('fields') or None, split('include'))
+
+    def columns(self, prefix=''):
+        columns = [f'{prefix}id']
+        for name in self.names:
+            if name in self.relations:
+                relation = self.relations[name].name
+                columns.append(f'{prefix}{relation}')
+                if name in self.include:
+                    columns += self.include[name].columns(
+                        f'{prefix}{relation}__'
+                    )
+            else:
+                columns += [f'{prefix}{column}'
+                            for column in self.fields[name].columns]
+        return columns
+
+    def prepare(self, queryset, *extra):
+        '''Запрос, который читает ровно нужные поля и встроенные объекты,
+        плюс колонки extra (например, нужные для пагинации)'''
+        return queryset.select_related(None).select_related(*(
+            self.relations[name].name for name in self.include
+        )).only(*self.columns(), *extra)
+
+    def to_dict(self, obj):
+        data = {}
+        for name in self.names:
+            if name in self.include:
+                related = getattr(obj, self.relations[name].name)
+                data[name] = (
+                    None if related is None
+                    else self.include[name].to_dict(related)
+                )
+            elif name in self.relations:
+                data[name] = getattr(obj, f'{self.relations[name].name}_id')
+            else:
+                data[name] = self.fields[name].value(obj)
+        return data
+
+    def stream(self, objects, **extra):
+        '''Отдает {**extra, "results": [...]} частями по CHUNK_SIZE байт,
+        не собирая весь ответ в памяти'''
+        buffer = ['{']
+        for key, value in extra.items():
+            buffer.append(f'{json.dumps(key)}:{encoder.encode(value)},')
+        buffer.append('"results":[')
+        size = 0
+        separator = ''
+        for obj in objects:
+            item = separator + encoder.encode(self.to_dict(obj))
+            buffer.append(item)
+            size += len(item)
+            separator = ','
+            if size >= CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+        buffer.append(']}')
+        yield ''.join(buffer)
+
+    def dumps(self, obj):
+        return encoder.encode(self.to_dict(obj))
+
+
+def file_url(field):
+    return field.url if field else None
+
+
+class UserSerializer(Serializer):
+    fields = {
+        'id': Field('id'),
+        'username': Field('username'),
+        'first_name': Field('first_name'),
+        'last_name': Field('last_name'),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'id': Field('id'),
+        'title': Field('title'),
+        'slug': Field('slug'),
+        'description': Field('description'),
+        'posts_count': Field('posts_count'),
+    }
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': Field('id'),
+        'text': Field('text'),
+        'created': Field('created'),
+        'image': Field('image', value=lambda post: file_url(post.image)),
+        'thumbnail': Field(
+            'thumbnail_list', value=lambda post: post.thumbnail_list or None
+        ),
+        'comments_count': Field('comments_count'),
+    }
+    relations = {
+        'author': Relation('author', UserSerializer),
+        'group': Relation('group', GroupSerializer),
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': Field('id'),
+        'text': Field('text'),
+        'created': Field('created'),
+    }
+    relations = {
+        'post': Relation('post', PostSerializer),
+        'author': Relation('author', UserSerializer),
+    }
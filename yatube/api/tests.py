@@ -0,0 +1,272 @@
+import base64
+import json
+from urllib.parse import urlencode
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.client import encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def basic_auth(username, password):
+    credentials = base64.b64encode(f'{username}:{password}'.encode())
+    return {'HTTP_AUTHORIZATION': f'Basic {credentials.decode()}'}
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', password='secret', first_name='Лев'
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', password='secret'
+        )
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Test text{i}',
+            )
+            for i in range(5)
+        ]
+        Comment.objects.create(
+            author=cls.reader, post=cls.posts[-1], text='Comment'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.author_auth = basic_auth('auth', 'secret')
+        self.reader_auth = basic_auth('reader', 'secret')
+
+    def get_json(self, url, **extra):
+        response = self.client.get(url, **extra)
+        if response.streaming:
+            return response, json.loads(b''.join(response.streaming_content))
+        return response, json.loads(response.content)
+
+    def send_json(self, method, url, data, **extra):
+        return getattr(self.client, method)(
+            url, json.dumps(data), content_type='application/json', **extra
+        )
+
+    def test_post_list_with_sparse_fields_and_include(self):
+        '''Лента отдает только запрошенные поля и встраивает автора'''
+        with self.assertNumQueries(1):
+            response, data = self.get_json(
+                reverse('api:post_list'),
+                data={'fields': 'id,text,author,group', 'include': 'author'},
+            )
+        self.assertEqual(response.status_code, 200)
+        first = data['results'][0]
+        self.assertEqual(set(first), {'id', 'text', 'author', 'group'})
+        self.assertEqual(first['id'], ApiTests.posts[-1].pk)
+        self.assertEqual(first['author'], {
+            'id': ApiTests.author.pk,
+            'username': 'auth',
+            'first_name': 'Лев',
+            'last_name': '',
+        })
+        self.assertEqual(first['group'], ApiTests.posts[-1].group_id)
+
+    def test_cursor_pagination(self):
+        '''Страницы ленты листаются курсором без повторов'''
+        url = reverse('api:post_list')
+        seen = []
+        params = {'limit': 2, 'fields': 'id'}
+        while True:
+            _, data = self.get_json(url, data=params)
+            seen += [post['id'] for post in data['results']]
+            if data['next_cursor'] is None:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(
+            seen, [post.pk for post in reversed(ApiTests.posts)]
+        )
+
+    def test_filters_groups_and_comments(self):
+        '''Фильтры ленты, группы и комментарии'''
+        _, data = self.get_json(
+            reverse('api:post_list'), data={'group': 'test-slug'}
+        )
+        self.assertEqual(len(data['results']), 2)
+        _, data = self.get_json(reverse('api:group_list'))
+        self.assertEqual(data['results'][0]['slug'], 'test-slug')
+        _, data = self.get_json(reverse(
+            'api:group_detail', kwargs={'slug': 'test-slug'}
+        ))
+        self.assertEqual(data['posts_count'], 2)
+        _, data = self.get_json(
+            reverse('api:comment_list',
+                    kwargs={'post_id': ApiTests.posts[-1].pk}),
+            data={'include': 'author'},
+        )
+        self.assertEqual(
+            data['results'][0]['author']['username'], 'reader'
+        )
+
+    def test_streamed_lists_are_read_inside_view(self):
+        '''Тело списка не обращается к базе после выхода из представления'''
+        response = self.client.get(
+            reverse('api:follow_list'), **self.reader_auth
+        )
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 0)
+
+    def test_bad_parameters(self):
+        '''Неизвестные поля и несуществующие объекты - ошибки в JSON'''
+        cases = (
+            (reverse('api:post_list'), {'fields': 'password'}, 400),
+            (reverse('api:post_list'), {'include': 'comments'}, 400),
+            (reverse('api:post_list'), {'limit': 'many'}, 400),
+            (reverse('api:post_detail', kwargs={'post_id': 10 ** 6}), {},
+             404),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response, data = self.get_json(url, data=params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', data)
+
+    def test_write_requires_login(self):
+        '''Анонимные записи и неверный пароль получают 401'''
+        url = reverse('api:post_list')
+        response = self.send_json('post', url, {'text': 'Новый'})
+        self.assertEqual(response.status_code, 401)
+        response = self.send_json(
+            'post', url, {'text': 'Новый'}, **basic_auth('auth', 'wrong')
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(Post.objects.count(), len(ApiTests.posts))
+
+    def test_session_writes_need_csrf(self):
+        '''Запись через сессию без CSRF-токена отклоняется'''
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(ApiTests.author)
+        response = client.post(
+            reverse('api:post_list'), json.dumps({'text': 'Новый'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_create_update_delete_post(self):
+        '''Автор создает, меняет и удаляет пост'''
+        response = self.send_json(
+            'post', reverse('api:post_list'),
+            {'text': 'Из приложения', 'group': ApiTests.group.pk},
+            **self.author_auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        created = json.loads(response.content)
+        self.assertEqual(created['author'], ApiTests.author.pk)
+        url = reverse('api:post_detail', kwargs={'post_id': created['id']})
+        response = self.send_json(
+            'patch', url, {'text': 'Чужая правка'}, **self.reader_auth
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.send_json(
+            'patch', url, {'text': 'Правка'}, **self.author_auth
+        )
+        self.assertEqual(json.loads(response.content)['text'], 'Правка')
+        self.assertEqual(
+            Post.objects.get(pk=created['id']).group, ApiTests.group
+        )
+        response = self.client.delete(url, **self.author_auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=created['id']).exists())
+
+    def test_patch_with_form_body(self):
+        '''PATCH принимает форму, а не только JSON'''
+        post = ApiTests.posts[0]
+        url = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        bodies = {
+            'multipart/form-data; boundary=BoUnDaRy': encode_multipart(
+                'BoUnDaRy', {'text': 'Правка формой'}
+            ),
+            'application/x-www-form-urlencoded': urlencode(
+                {'text': 'Правка формой'}
+            ),
+        }
+        for content_type, body in bodies.items():
+            with self.subTest(content_type=content_type):
+                Post.objects.filter(pk=post.pk).update(text='Было')
+                response = self.client.patch(
+                    url, body, content_type=content_type,
+                    **self.author_auth,
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    Post.objects.get(pk=post.pk).text, 'Правка формой'
+                )
+        response = self.client.patch(
+            url, 'text', content_type='text/plain', **self.author_auth
+        )
+        self.assertEqual(response.status_code, 415)
+
+    def test_invalid_post_returns_form_errors(self):
+        '''Ошибки формы возвращаются по полям'''
+        response = self.send_json(
+            'post', reverse('api:post_list'), {'text': ''},
+            **self.author_auth,
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', json.loads(response.content)['errors'])
+
+    def test_comment(self):
+        '''Комментарий добавляется через API'''
+        post = ApiTests.posts[0]
+        response = self.send_json(
+            'post',
+            reverse('api:comment_list', kwargs={'post_id': post.pk}),
+            {'text': 'Из приложения'}, **self.reader_auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Comment.objects.filter(
+            post=post, author=ApiTests.reader, text='Из приложения'
+        ).exists())
+
+    def test_follows_and_feed(self):
+        '''Подписка, лента подписок и отписка'''
+        url = reverse('api:follow_list')
+        response = self.send_json(
+            'post', url, {'author': 'auth'}, **self.reader_auth
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.send_json(
+            'post', url, {'author': 'auth'}, **self.reader_auth
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.send_json(
+            'post', url, {'author': 'reader'}, **self.reader_auth
+        )
+        self.assertEqual(response.status_code, 400)
+        _, data = self.get_json(url, **self.reader_auth)
+        self.assertEqual(
+            [user['username'] for user in data['results']], ['auth']
+        )
+        _, data = self.get_json(
+            reverse('api:feed'), data={'fields': 'id'}, **self.reader_auth
+        )
+        self.assertEqual(len(data['results']), len(ApiTests.posts))
+        response = self.client.delete(
+            reverse('api:follow_detail', kwargs={'username': 'auth'}),
+            **self.reader_auth,
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_feed_requires_login(self):
+        '''Лента подписок только для вошедших'''
+        response = self.client.get(reverse('api:feed'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
@@ -0,0 +1,306 @@
+import base64
+import binascii
+import json
+from functools import partial, wraps
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.http import (
+    Http404, HttpResponse, QueryDict, StreamingHttpResponse
+)
+from django.http.multipartparser import MultiPartParserError
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from core.db_router import replica_reads
+from core.paginators import CursorPaginator
+from posts import follows, timelines
+from posts.forms import CommentForm, PostForm
+from posts.models import Comment, Group, Post, User
+from .serializers import (
+    CommentSerializer, GroupSerializer, PostSerializer, UserSerializer,
+    encoder,
+)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+JSON = 'application/json'
+MULTIPART = 'multipart/form-data'
+FORM = 'application/x-www-form-urlencoded'
+
+
+class BadRequest(Exception):
+    pass
+
+
+class UnsupportedMediaType(Exception):
+    pass
+
+
+def json_response(data, status=200):
+    return HttpResponse(encoder.encode(data), JSON, status=status)
+
+
+def error(status, detail, **extra):
+    return json_response({'detail': detail, **extra}, status)
+
+
+def basic_auth_user(request):
+    '''Пользователь из заголовка Authorization: Basic или None'''
+    scheme, _, credentials = request.META['HTTP_AUTHORIZATION'].partition(
+        ' '
+    )
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        decoded = base64.b64decode(credentials, validate=True).decode()
+    except (binascii.Error, UnicodeError):
+        return None
+    username, _, password = decoded.partition(':')
+    return authenticate(request, username=username, password=password)
+
+
+def check_user(request, login):
+    '''Ставит request.user по Basic-авторизации или сессии; возвращает
+    ответ с ошибкой, если пускать запрос нельзя'''
+    if 'HTTP_AUTHORIZATION' in request.META:
+        user = basic_auth_user(request)
+        if user is None:
+            return unauthorized('Неверный логин или пароль')
+        request.user = user
+    elif (request.user.is_authenticated
+          and request.method not in SAFE_METHODS):
+        # записи через сессию проверяются на CSRF, как формы сайта
+        if CsrfViewMiddleware().process_view(request, None, (), {}):
+            return error(403, 'Нет CSRF-токена')
+    if ((login or request.method not in SAFE_METHODS)
+            and not request.user.is_authenticated):
+        return unauthorized('Нужна авторизация')
+    return None
+
+
+def api_view(*methods, login=False):
+    '''Обертка представлений API: пускает только методы methods, требует
+    вход для записей и для login=True, отдает ошибки в JSON, а чтения
+    отправляет на реплики'''
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = error(405, 'Метод не поддерживается')
+                response['Allow'] = ', '.join(methods)
+                return response
+            rejected = check_user(request, login)
+            if rejected is not None:
+                return rejected
+            handler = view
+            if request.method in SAFE_METHODS:
+                handler = replica_reads(view)
+            try:
+                return handler(request, *args, **kwargs)
+            except Http404:
+                return error(404, 'Не найдено')
+            except BadRequest as bad_request:
+                return error(400, str(bad_request))
+            except UnsupportedMediaType as unsupported:
+                return error(415, str(unsupported))
+        return wrapper
+    return decorator
+
+
+def unauthorized(detail):
+    response = error(401, detail)
+    response['WWW-Authenticate'] = 'Basic realm="yatube"'
+    return response
+
+
+def get_serializer(serializer_class, request):
+    try:
+        return serializer_class.from_request(request)
+    except ValueError as invalid:
+        raise BadRequest(str(invalid))
+
+
+def get_limit(request):
+    '''Размер страницы из ?limit=, не больше API_MAX_PAGE_SIZE'''
+    try:
+        limit = int(request.GET.get('limit', settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def read_data(request):
+    '''Данные записи: JSON из тела или поля формы с файлами'''
+    if request.content_type == JSON:
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise BadRequest('Тело запроса - не JSON')
+        if not isinstance(data, dict):
+            raise BadRequest('Ожидается JSON-объект')
+        return data, None
+    if request.content_type not in (MULTIPART, FORM):
+        raise UnsupportedMediaType('Тело запроса - JSON или форма')
+    if request.method == 'POST':
+        return request.POST.dict(), request.FILES
+    # формы в PATCH и PUT Django сам не разбирает
+    if request.content_type == FORM:
+        return QueryDict(request.body, encoding=request.encoding).dict(), None
+    try:
+        data, files = request.parse_file_upload(request.META, request)
+    except MultiPartParserError as broken:
+        raise BadRequest(f'Форма не разобрана: {broken}')
+    return data.dict(), files
+
+
+def invalid(form):
+    return error(400, 'Ошибка в данных', errors=form.errors)
+
+
+def page_response(request, serializer, queryset, paginator=CursorPaginator):
+    '''Страница ленты по ?cursor= и ?limit=, отдаваемая потоком'''
+    paginator = paginator(
+        serializer.prepare(queryset, 'created'), get_limit(request)
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return StreamingHttpResponse(serializer.stream(
+        page.object_list,
+        next_cursor=page.next_cursor,
+        previous_cursor=page.previous_cursor,
+    ), JSON)
+
+
+def list_response(serializer, queryset):
+    '''Весь список потоком. Объекты читаются из базы здесь же: тело
+    ответа отдается уже после выхода из представления, без маршрутизации
+    на реплики и без учета запросов в статистике запроса'''
+    return StreamingHttpResponse(
+        serializer.stream(list(serializer.prepare(queryset))), JSON
+    )
+
+
+def object_response(serializer, queryset, status=200, **lookup):
+    obj = get_object_or_404(serializer.prepare(queryset), **lookup)
+    return HttpResponse(serializer.dumps(obj), JSON, status=status)
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    serializer = get_serializer(PostSerializer, request)
+    if request.method == 'POST':
+        data, files = read_data(request)
+        form = PostForm(data, files)
+        if not form.is_valid():
+            return invalid(form)
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        return object_response(
+            serializer, Post.objects.all(), status=201, pk=post.pk
+        )
+    queryset = Post.objects.all()
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return page_response(request, serializer, queryset)
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    serializer = get_serializer(PostSerializer, request)
+    if request.method == 'GET':
+        return object_response(serializer, Post.objects.all(), pk=post_id)
+    post = get_object_or_404(Post, pk=post_id)
+    if post.author_id != request.user.pk:
+        return error(403, 'Изменять пост может только автор')
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=204)
+    data, files = read_data(request)
+    # PATCH меняет только переданные поля
+    form = PostForm(
+        {'text': post.text, 'group': post.group_id, **data},
+        files, instance=post,
+    )
+    if not form.is_valid():
+        return invalid(form)
+    form.save()
+    return object_response(serializer, Post.objects.all(), pk=post_id)
+
+
+@api_view('GET', login=True)
+def feed(request):
+    '''Лента подписок пользователя'''
+    return page_response(
+        request, get_serializer(PostSerializer, request), Post.objects.all(),
+        paginator=partial(timelines.TimelinePaginator, request.user),
+    )
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    serializer = get_serializer(CommentSerializer, request)
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    if request.method == 'POST':
+        data, _ = read_data(request)
+        form = CommentForm(data)
+        if not form.is_valid():
+            return invalid(form)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        return object_response(
+            serializer, Comment.objects.all(), status=201, pk=comment.pk
+        )
+    return page_response(
+        request, serializer, Comment.objects.filter(post=post)
+    )
+
+
+@api_view('GET')
+def group_list(request):
+    return list_response(
+        get_serializer(GroupSerializer, request),
+        Group.objects.order_by('title'),
+    )
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    return object_response(
+        get_serializer(GroupSerializer, request), Group.objects.all(),
+        slug=slug,
+    )
+
+
+@api_view('GET', 'POST', login=True)
+def follow_list(request):
+    '''Авторы, на которых подписан пользователь; POST подписывает'''
+    serializer = get_serializer(UserSerializer, request)
+    if request.method == 'POST':
+        data, _ = read_data(request)
+        author = get_object_or_404(User, username=data.get('author'))
+        if author == request.user:
+            raise BadRequest('Нельзя подписаться на себя')
+        created = follows.follow(request.user, author)
+        return object_response(
+            serializer, User.objects.all(), status=201 if created else 200,
+            pk=author.pk,
+        )
+    return list_response(
+        serializer,
+        User.objects.filter(following__user=request.user).order_by(
+            'username'
+        ),
+    )
+
+
+@api_view('DELETE', login=True)
+def follow_detail(request, username):
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, author)
+    return HttpResponse(status=204)
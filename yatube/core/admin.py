@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'arguments', 'priority', 'status', 'attempts',
+        'run_after', 'worker',
+    )
+    search_fields = ('name',)
+    list_filter = ('status', 'name',)
+    empty_value_display = '-пусто-'
+    actions = ('retry',)
+
+    def retry(self, request, queryset):
+        '''Возвращает задачи в очередь с новым запасом попыток'''
+        retried = queryset.exclude(status=Task.RUNNING).update(
+            status=Task.QUEUED, attempts=0, run_after=timezone.now(),
+            worker='',
+        )
+        self.message_user(request, f'Поставлено в очередь: {retried}')
+    retry.short_description = 'Выполнить снова'
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        if settings.PRECOMPILE_TEMPLATES:
+            from . import template_loaders
+            template_loaders.preload()
@@ -0,0 +1,164 @@
+'''ASGI-приложение для Django 2.2, в котором своего ASGI еще нет.
+
+Сервер принимает соединения в цикле событий: медленные клиенты, пока
+шлют запрос или читают ответ, не занимают потоков. Представление
+выполняется обычным обработчиком Django в пуле из ASGI_THREADS потоков,
+который занят только на время работы кода сайта. Потоковые ответы
+(выгрузки API) отдаются из того же потока, что их читает из базы.
+'''
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+
+def get_environ(scope, body, size):
+    '''WSGI-окружение запроса по ASGI scope'''
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передает путь байтами в latin-1
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            # повторные Cookie склеиваются через «; », остальные через «,»
+            separator = '; ' if name == 'cookie' else ','
+            value = f'{environ[key]}{separator}{value}'
+        environ[key] = value
+    # тело без Content-Length (chunked) сервер уже собрал целиком
+    environ.setdefault('CONTENT_LENGTH', str(size))
+    return environ
+
+
+def response_start(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+        ],
+    }
+
+
+class ASGIHandler:
+    def __init__(self, threads=None):
+        self.wsgi = WSGIHandler()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Протокол {scope["type"]} не поддерживается')
+        body, size = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            start, content = await loop.run_in_executor(
+                self.executor, self.respond,
+                get_environ(scope, body, size), loop, send,
+            )
+        finally:
+            body.close()
+        if start is not None:
+            await send(start)
+            await send({'type': 'http.response.body', 'body': content})
+
+    async def read_body(self, receive):
+        '''Тело запроса: большое уходит во временный файл. Если клиент
+        отключился, не дослав его, возвращает (None, 0)'''
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None, 0
+            chunk = message.get('body', b'')
+            body.write(chunk)
+            size += len(chunk)
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body, size
+
+    def respond(self, environ, loop, send):
+        '''Выполняется в пуле. Обычный ответ возвращает готовым, чтобы
+        отдать его клиенту без потока; потоковый отдает сам'''
+        start = {}
+
+        def start_response(status, headers):
+            start.update(response_start(status, headers))
+
+        response = self.wsgi(environ, start_response)
+        try:
+            if not response.streaming:
+                return start, response.content
+            self.send_from_thread(loop, send, start)
+            for chunk in response:
+                if chunk:
+                    self.send_from_thread(loop, send, {
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            self.send_from_thread(
+                loop, send, {'type': 'http.response.body'}
+            )
+            return None, None
+        finally:
+            # request_finished закрывает соединения с базой этого потока
+            response.close()
+
+    def send_from_thread(self, loop, send, message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ASGIHandler()
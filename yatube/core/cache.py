@@ -0,0 +1,232 @@
+import math
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .request_stats import record_cache
+
+_missing = object()
+
+
+class SQLiteCache(BaseCache):
+    '''Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+    LOCATION - путь к файлу базы. Каждый поток открывает свое
+    соединение; журнал WAL позволяет читать, пока другой процесс пишет.
+    '''
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.location, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB, expires REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def write(self, statements):
+        '''Выполняет запросы одной транзакцией, блокируя запись сразу'''
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            results = [
+                connection.execute(sql, params).rowcount
+                for sql, params in statements
+            ]
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return results
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        _, added = self.write((
+            ('DELETE FROM cache WHERE key = ? AND expires < ?',
+             (key, time.time())),
+            ('INSERT OR IGNORE INTO cache VALUES (?, ?, ?)',
+             (key, pickle.dumps(value), self.get_backend_timeout(timeout))),
+        ))
+        if added:
+            self.cull()
+        return bool(added)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.connection.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires >= ?)',
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        if not keys:
+            return {}
+        rows = self.connection.execute(
+            'SELECT key, value FROM cache WHERE key IN ({}) '
+            'AND (expires IS NULL OR expires >= ?)'.format(
+                ', '.join('?' * len(keys))
+            ),
+            (*keys, time.time()),
+        )
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        statements = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append((
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                (key, pickle.dumps(value), expires),
+            ))
+        self.write(statements)
+        self.cull()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        [touched] = self.write((
+            ('UPDATE cache SET expires = ? WHERE key = ? '
+             'AND (expires IS NULL OR expires >= ?)',
+             (self.get_backend_timeout(timeout), key, time.time())),
+        ))
+        return bool(touched)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        statements = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append(('DELETE FROM cache WHERE key = ?', (key,)))
+        if statements:
+            self.write(statements)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def clear(self):
+        self.write((('DELETE FROM cache', ()),))
+
+    def cull(self):
+        '''Удаляет просроченные записи, а при переполнении - и старые'''
+        [count] = self.connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()
+        if count <= self._max_entries:
+            return
+        statements = [
+            ('DELETE FROM cache WHERE expires < ?', (time.time(),)),
+        ]
+        if self._cull_frequency:
+            statements.append((
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,),
+            ))
+        else:
+            statements = [('DELETE FROM cache', ())]
+        self.write(statements)
+
+    def close(self, **kwargs):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class StatsCacheMixin:
+    '''Отмечает попадания и промахи в статистике текущего запроса'''
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        record_cache(value is not _missing)
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        for key in keys:
+            record_cache(key in found)
+        return found
+
+
+class StatsLocMemCache(StatsCacheMixin, LocMemCache):
+    pass
+
+
+class StatsSQLiteCache(StatsCacheMixin, SQLiteCache):
+    pass
+
+
+def get_or_compute(key, compute, timeout, cache=None, beta=1.0,
+                   lock_timeout=10, wait=0.05):
+    '''Значение из кэша или compute() с защитой от лавины запросов.
+
+    Вероятностное раннее обновление (XFetch): чем ближе конец срока и чем
+    дольше считается значение, тем вероятнее, что очередной читатель
+    обновит его заранее. Одновременно считает только один процесс -
+    владелец блокировки cache.add; остальные отдают старое значение, а
+    если его нет - ждут нового не дольше lock_timeout секунд.
+    '''
+    cache = cache or default_cache
+    lock_key = f'{key}:lock'
+    deadline = time.time() + lock_timeout
+    while True:
+        entry = cache.get(key)
+        if entry is not None:
+            value, delta, expires = entry
+            early = delta * beta * -math.log(1 - random.random())
+            if time.time() + early < expires:
+                return value
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, lock_timeout):
+            break
+        if entry is not None:
+            return entry[0]
+        if time.time() >= deadline:
+            # владелец блокировки не успел - считаем сами
+            return compute()
+        time.sleep(wait)
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+        return value
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
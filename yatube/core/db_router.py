@@ -0,0 +1,77 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'db_primary'
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    '''Куда читать в рамках одного запроса'''
+
+    def __init__(self, sticky=False):
+        # сессия недавно писала в базу и должна видеть свои изменения
+        self.sticky = sticky
+        self.use_replica = False
+        self.wrote = False
+
+
+@contextmanager
+def routing(sticky=False):
+    state = RoutingState(sticky)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def replica_reads(view):
+    '''Представление читает с реплики, если сессия не писала недавно'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or state.sticky:
+            return view(request, *args, **kwargs)
+        state.use_replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+    return wrapper
+
+
+class ReplicaRouter:
+    '''Чтения помеченных представлений - на реплики, остальное - на primary.
+
+    После записи запрос до конца читает с primary, а middleware ставит
+    cookie, по которой следующие запросы сессии тоже идут на primary,
+    пока реплики не догонят изменения.
+    '''
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or not state.use_replica or state.wrote:
+            return PRIMARY
+        if not replicas:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики хранят те же данные, что и primary
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
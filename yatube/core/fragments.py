@@ -0,0 +1,46 @@
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+
+PLACEHOLDER = '<!--personal:{}-->'
+PLACEHOLDER_RE = re.compile(r'<!--personal:([A-Za-z0-9_=-]+)-->')
+
+_fragments = {}
+
+
+def register(name):
+    '''Регистрирует персональный фрагмент страницы: функцию
+    (request, **params) -> HTML, которая рисует его для зрителя'''
+    def decorator(function):
+        _fragments[name] = function
+        return function
+    return decorator
+
+
+def render(request, name, params):
+    return _fragments[name](request, **params)
+
+
+def placeholder(name, params):
+    '''Метка фрагмента в общей части страницы. Пользовательский текст
+    экранируется шаблонами, поэтому подделать метку он не может'''
+    data = json.dumps([name, params], separators=(',', ':'))
+    return PLACEHOLDER.format(
+        base64.urlsafe_b64encode(data.encode()).decode()
+    )
+
+
+def assemble(request, content):
+    '''Подставляет вместо меток фрагменты, нарисованные для зрителя'''
+    def replace(match):
+        name, params = json.loads(base64.urlsafe_b64decode(match[1]))
+        return render(request, name, params)
+
+    return PLACEHOLDER_RE.sub(replace, content)
+
+
+@register('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
@@ -0,0 +1,65 @@
+import multiprocessing
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import tasks
+
+
+def run_worker(number, burst):
+    '''Процесс обработчика: SIGTERM и SIGINT дают доделать текущую задачу'''
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    return tasks.work(tasks.worker_name(number), stop, burst)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает обработчики фоновых задач из очереди core_task. '
+        'Остановка по SIGTERM или Ctrl+C: текущие задачи доделываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.TASK_WORKER_PROCESSES,
+            help='Сколько процессов выполняют задачи',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выйти, когда очередь опустеет',
+        )
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        if processes == 1:
+            done = run_worker(0, options['burst'])
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+        # соединения с базой нельзя делить между процессами
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=run_worker, args=(number, options['burst'])
+            )
+            for number in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Ctrl+C получают все процессы группы, остается дождаться их
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработчики остановлены: {processes}'
+        ))
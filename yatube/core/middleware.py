@@ -0,0 +1,158 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from . import db_router, fragments, request_stats
+
+PAGE_CACHE_KEY = 'page:{}:{}'
+
+
+class RequestStatsMiddleware:
+    '''Замеряет каждый запрос: заголовок Server-Timing
+    и сводка по представлениям на странице статистики'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_stats.collect() as stats:
+            response = self.get_response(request)
+        response['Server-Timing'] = stats.server_timing()
+        match = request.resolver_match
+        if match is not None:
+            request_stats.add(match.view_name, stats)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    '''Включает маршрутизацию чтений на реплики для запроса и
+    запоминает сессии, которые только что писали в базу'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky = db_router.STICKY_COOKIE in request.COOKIES
+        with db_router.routing(sticky) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                db_router.STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class PersonalFragmentsMiddleware:
+    '''Включает сборку страниц из общей части и персональных фрагментов:
+    шаблоны оставляют на месте {% personal %} метки, а middleware
+    подставляет фрагменты, нарисованные для зрителя, уже в готовый ответ'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.assemble_fragments = True
+        response = self.get_response(request)
+        if (response.streaming
+                or not response.get('Content-Type', '').startswith(
+                    'text/html'
+                )):
+            return response
+        response.content = fragments.assemble(
+            request, response.content.decode(response.charset)
+        )
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = len(response.content)
+        return response
+
+
+class SharedPageCacheMiddleware:
+    '''Кэширует общую часть страниц лент, одну для всех зрителей.
+
+    Кэшируются представления с атрибутом page_version (его ставит
+    feed_cache.conditional). Ключ страницы - ее адрес и версия лент, из
+    которых она собрана для анонима, поэтому сигналы, сбрасывающие эти
+    ленты, сразу делают недостижимыми ровно те страницы, где показан
+    измененный объект. Персональные части подставляет
+    PersonalFragmentsMiddleware; без нее кэш обслуживает только анонимов.
+    Сессии, которые только что писали, идут мимо кэша.
+    '''
+    skip_cookies = (db_router.STICKY_COOKIE, CookieStorage.cookie_name)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        page = self.get_page(request)
+        if page is None:
+            return self.get_response(request)
+        match, key, (etag, last_modified) = page
+        response = cache.get(key)
+        if response is None:
+            response = self.get_response(request)
+            if self.cacheable(response):
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        request.resolver_match = match
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+
+    def get_page(self, request):
+        '''(resolver_match, ключ, версия для зрителя) страницы или None,
+        если запрос не обслуживается кэшем'''
+        if request.method != 'GET' or any(
+            name in request.COOKIES for name in self.skip_cookies
+        ):
+            return None
+        shared = getattr(request, 'assemble_fragments', False)
+        if request.user.is_authenticated and not shared:
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        page_version = getattr(match.func, 'page_version', None)
+        if page_version is None:
+            return None
+        page_version = db_router.replica_reads(page_version)
+        user = request.user
+        request.user = AnonymousUser()
+        try:
+            version = page_version(request, *match.args, **match.kwargs)
+        finally:
+            request.user = user
+        if version is None:
+            return None
+        key = PAGE_CACHE_KEY.format(
+            version[0].strip('"'),
+            hashlib.md5(request.build_absolute_uri().encode()).hexdigest(),
+        )
+        if user.is_authenticated:
+            # ETag вошедшего зависит и от него самого
+            version = page_version(request, *match.args, **match.kwargs)
+        return match, key, version
+
+    @staticmethod
+    def cacheable(response):
+        cache_control = response.get('Cache-Control', '')
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in cache_control
+            and 'no-store' not in cache_control
+        )
@@ -1,7 +1,19 @@
-from django.db import models
+from django.db import models, transaction
 
 
-class CreatedModel(models.Model):
+class AtomicSaveModel(models.Model):
+    '''Абстрактная модель сохраняется вместе с обработчиками post_save
+    в одной транзакции'''
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class CreatedModel(AtomicSaveModel):
     '''Абстрактная модель добавляет дату создания'''
     created = models.DateTimeField(
         'Дата публикации',
@@ -13,3 +25,42 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Task(models.Model):
+    '''Фоновая задача в очереди; ее выполняет manage.py run_workers'''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    arguments = models.TextField('Аргументы (JSON)', default='[]')
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток')
+    run_after = models.DateTimeField('Выполнить не раньше', db_index=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    worker = models.CharField('Обработчик', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_after'],
+                name='task_queue_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.arguments}'
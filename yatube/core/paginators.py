@@ -0,0 +1,128 @@
+import base64
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(obj, direction):
+    '''Упаковывает позицию (created, id) объекта в непрозрачный токен'''
+    return encode_position(obj.created, obj.pk, direction)
+
+
+def encode_position(created, pk, direction):
+    payload = json.dumps(
+        [created.isoformat(), pk, direction],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''Возвращает (created, id, direction) или None для битого токена'''
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode((cursor + padding).encode())
+        created, pk, direction = json.loads(raw.decode())
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        return None
+    # id вне диапазона INTEGER базы роняет запрос, а не сравнение
+    if created is None or direction not in (NEXT, PREVIOUS) or not (
+        0 <= pk < 2 ** 63
+    ):
+        return None
+    return created, pk, direction
+
+
+def after(queryset, position, id_field='id'):
+    '''Объекты за позицией (created, id, direction), упорядоченные в
+    направлении обхода; без позиции - с начала ленты'''
+    newest = ('-created', f'-{id_field}')
+    if position is None:
+        return queryset.order_by(*newest)
+    created, pk, direction = position
+    if direction == NEXT:
+        return queryset.filter(
+            Q(created__lt=created)
+            | Q(created=created, **{f'{id_field}__lt': pk})
+        ).order_by(*newest)
+    return queryset.filter(
+        Q(created__gt=created)
+        | Q(created=created, **{f'{id_field}__gt': pk})
+    ).order_by('created', id_field)
+
+
+class CursorPaginator(Paginator):
+    '''Keyset-пагинация по (created, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается по курсору - позиции последнего (или первого)
+    показанного объекта, поэтому новые записи не сдвигают уже открытые
+    страницы. Номер страницы и число страниц не вычисляются: number равен
+    1 для первой страницы и 2 для остальных, а num_pages лишь сообщает
+    Page, есть ли следующая страница.
+    '''
+    ordering = ('-created', '-id')
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._number = 1
+        self._has_next = False
+
+    @property
+    def num_pages(self):
+        return self._number + self._has_next
+
+    def fetch(self, position):
+        '''До per_page + 1 объектов за позицией курсора в порядке обхода'''
+        return list(after(self.object_list, position)[:self.per_page + 1])
+
+    def page(self, cursor):
+        '''Страница по курсору. Битый курсор открывает первую страницу,
+        а верный, за которым ничего нет (например, записи удалены), -
+        пустую страницу без следующей'''
+        position = decode_cursor(cursor)
+        direction = NEXT if position is None else position[2]
+        objects = self.fetch(position)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == NEXT:
+            has_previous = position is not None
+            self._has_next = has_more
+        else:
+            objects.reverse()
+            has_previous = has_more
+            self._has_next = bool(objects)
+        self._number = 2 if has_previous else 1
+        page = Page(objects, self._number, self)
+        page.previous_cursor = None
+        page.next_cursor = None
+        if has_previous:
+            if objects:
+                page.previous_cursor = encode_cursor(objects[0], PREVIOUS)
+            else:
+                # назад с пустой страницы - страница, которая кончается
+                # объектом курсора: id - 1 включает его в выборку
+                created, pk, _ = position
+                page.previous_cursor = encode_position(
+                    created, pk - 1, PREVIOUS
+                )
+        if self._has_next:
+            page.next_cursor = encode_cursor(objects[-1], NEXT)
+        return page
+
+    def get_page(self, cursor):
+        return self.page(cursor)
+
+
+def get_cursor_page(request, object_list, per_page):
+    '''Страница объектов по параметру ?cursor= из запроса'''
+    paginator = CursorPaginator(object_list, per_page)
+    return paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,128 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+_current = ContextVar('request_stats', default=None)
+_lock = threading.Lock()
+_views = {}
+
+
+class RequestStats:
+    '''Запросы к базе, время SQL и шаблонов, попадания в кэш за запрос'''
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_ms = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+
+    def server_timing(self):
+        '''Значение заголовка Server-Timing'''
+        return ', '.join((
+            f'sql;dur={self.sql_ms:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total_ms:.1f}',
+        ))
+
+
+@contextmanager
+def collect():
+    '''Собирает статистику всего, что выполняется внутри блока'''
+    stats = RequestStats()
+    token = _current.set(stats)
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(stats.execute_wrapper)
+                )
+            yield stats
+    finally:
+        stats.total_ms = (time.perf_counter() - started) * 1000
+        _current.reset(token)
+
+
+def record_cache(hit):
+    stats = _current.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+@contextmanager
+def record_template():
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.template_ms += (time.perf_counter() - started) * 1000
+
+
+def add(view_name, stats):
+    '''Копит статистику запроса в сводке по представлению'''
+    with _lock:
+        total = _views.setdefault(view_name, {
+            'requests': 0,
+            'queries': 0,
+            'sql_ms': 0.0,
+            'template_ms': 0.0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+        })
+        total['requests'] += 1
+        total['max_ms'] = max(total['max_ms'], stats.total_ms)
+        for field in (
+            'queries', 'sql_ms', 'template_ms', 'total_ms',
+            'cache_hits', 'cache_misses',
+        ):
+            total[field] += getattr(stats, field)
+
+
+def summary():
+    '''Средние значения по представлениям, самые медленные первыми'''
+    with _lock:
+        views = [(name, dict(total)) for name, total in _views.items()]
+    rows = []
+    for name, total in views:
+        requests = total['requests']
+        lookups = total['cache_hits'] + total['cache_misses']
+        rows.append({
+            'view_name': name,
+            'requests': requests,
+            'queries': total['queries'] / requests,
+            'sql_ms': total['sql_ms'] / requests,
+            'template_ms': total['template_ms'] / requests,
+            'total_ms': total['total_ms'] / requests,
+            'max_ms': total['max_ms'],
+            'cache_hit_ratio': (
+                total['cache_hits'] / lookups if lookups else None
+            ),
+        })
+    return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+
+def reset():
+    with _lock:
+        _views.clear()
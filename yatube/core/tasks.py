@@ -0,0 +1,201 @@
+import datetime as dt
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import (
+    OperationalError, close_old_connections, connection, transaction
+)
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def task(priority=0, max_attempts=None):
+    '''Делает функцию фоновой задачей: function.delay(*args) ставит ее
+    в очередь. Аргументы должны сохраняться в JSON (id, строки, числа).
+    Задача может выполниться повторно, поэтому должна быть идемпотентной'''
+    def decorator(function):
+        name = f'{function.__module__}.{function.__name__}'
+        function.delay = partial(
+            enqueue, name, priority=priority, max_attempts=max_attempts
+        )
+        return function
+    return decorator
+
+
+def enqueue(name, *args, priority=0, max_attempts=None):
+    '''Ставит задачу в очередь в текущей транзакции: обработчики увидят
+    ее только вместе с данными, ради которых она поставлена.
+
+    С TASKS_EAGER очереди нет: задача выполняется в пуле потоков этого
+    процесса после коммита.
+    '''
+    if settings.TASKS_EAGER:
+        transaction.on_commit(partial(submit, name, args))
+        return None
+    return Task.objects.create(
+        name=name,
+        arguments=json.dumps(args),
+        priority=priority,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_after=timezone.now(),
+    )
+
+
+def get_function(name):
+    function = import_string(name)
+    if not hasattr(function, 'delay'):
+        raise ImportError(f'{name} - не фоновая задача')
+    return function
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TASK_EAGER_THREADS,
+            thread_name_prefix='tasks',
+        )
+    return _executor
+
+
+def use_pool():
+    '''Базу sqlite в памяти нельзя делить между потоками'''
+    in_memory = (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+    return settings.TASK_EAGER_THREADS > 0 and not in_memory
+
+
+def submit(name, args):
+    if use_pool():
+        get_executor().submit(run_eager, name, args)
+    else:
+        run_eager(name, args)
+
+
+def run_eager(name, args):
+    '''Задача пула: своя сессия с базой и ошибки только в лог'''
+    close_old_connections()
+    try:
+        get_function(name)(*args)
+    except Exception:
+        logger.exception('Задача %s%s не выполнена', name, args)
+    finally:
+        close_old_connections()
+
+
+def claim(worker):
+    '''Берет в работу самую приоритетную готовую задачу или возвращает
+    None. Задачу забирает тот обработчик, чей UPDATE первым сменил ее
+    состояние, поэтому одну задачу не выполнят дважды'''
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_after__lte=now
+    ).order_by('-priority', 'run_after', 'pk').values_list(
+        'pk', flat=True
+    )[:settings.TASK_CLAIM_CANDIDATES]
+    for pk in candidates:
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            worker=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    return dt.timedelta(
+        seconds=settings.TASK_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+
+
+def execute(task):
+    '''Выполняет взятую задачу. Выполненная удаляется из очереди,
+    упавшая ставится повторно с растущей паузой, а исчерпавшая попытки
+    остается в таблице с ошибкой'''
+    try:
+        get_function(task.name)(*json.loads(task.arguments))
+    except Exception:
+        logger.exception('Задача %s не выполнена', task)
+        failed = task.attempts >= task.max_attempts
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.FAILED if failed else Task.QUEUED,
+            run_after=timezone.now() + retry_delay(task.attempts),
+            worker='',
+            last_error=traceback.format_exc(),
+        )
+        return False
+    Task.objects.filter(pk=task.pk).delete()
+    return True
+
+
+def requeue_stale():
+    '''Возвращает в очередь задачи обработчиков, которые упали,
+    не закончив их. Задача, исчерпавшая попытки, помечается упавшей:
+    иначе та, что роняет сам обработчик, возвращалась бы бесконечно'''
+    stale = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=timezone.now() - dt.timedelta(
+            seconds=settings.TASK_TIMEOUT
+        ),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        worker='',
+        last_error='Обработчик не закончил задачу за TASK_TIMEOUT',
+    )
+    return stale.update(status=Task.QUEUED, worker='')
+
+
+def worker_name(number=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{number}'
+
+
+def work(worker, stop=None, burst=False):
+    '''Цикл обработчика: берет и выполняет задачи, пока не выставлен
+    stop. С burst=True заканчивает, как только очередь опустела.
+    Возвращает число выполненных задач'''
+    stop = stop or threading.Event()
+    done = 0
+    idle = True
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            if idle:
+                requeue_stale()
+            task = claim(worker)
+        except OperationalError:
+            # SQLite: база занята другим обработчиком
+            logger.warning('Очередь задач занята', exc_info=True)
+            stop.wait(settings.TASK_POLL_INTERVAL)
+            continue
+        idle = task is None
+        if idle:
+            if burst:
+                break
+            stop.wait(settings.TASK_POLL_INTERVAL)
+            continue
+        try:
+            done += execute(task)
+        except OperationalError:
+            # итог не записан: задачу вернет в очередь requeue_stale()
+            logger.warning('Не записан итог задачи %s', task, exc_info=True)
+    close_old_connections()
+    return done
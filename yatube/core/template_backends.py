@@ -0,0 +1,23 @@
+from django.template.backends.django import DjangoTemplates, Template
+
+from .request_stats import record_template
+
+
+class StatsTemplate(Template):
+    '''Шаблон, который замеряет время своей отрисовки'''
+
+    def render(self, context=None, request=None):
+        with record_template():
+            return super().render(context, request)
+
+
+class StatsDjangoTemplates(DjangoTemplates):
+    '''Шаблоны Django с замером времени отрисовки для статистики'''
+
+    def from_string(self, template_code):
+        return StatsTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return StatsTemplate(
+            super().get_template(template_name).template, self
+        )
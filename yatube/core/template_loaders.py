@@ -0,0 +1,91 @@
+import os
+
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import Node
+from django.template.loader_tags import BlockNode, ExtendsNode, IncludeNode
+from django.template.loaders import cached
+
+
+class InlinedIncludeNode(Node):
+    '''Тело {% include %}, подставленное в шаблон при загрузке:
+    не ищет шаблон и не открывает новое состояние отрисовки'''
+
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        with context.push():
+            return self.nodelist.render(context)
+
+
+def included_name(node):
+    '''Имя шаблона для {% include "имя" %} без with и only, иначе None'''
+    expression = node.template
+    if (node.extra_context or node.isolated_context or expression.filters
+            or not isinstance(expression.var, str)):
+        return None
+    return expression.var
+
+
+def child_nodelists(node):
+    for attr in node.child_nodelists:
+        nodelist = getattr(node, attr, None)
+        if nodelist:
+            yield nodelist
+    # у {% if %} ветки хранятся парами (условие, nodelist)
+    for _, nodelist in getattr(node, 'conditions_nodelists', ()):
+        yield nodelist
+
+
+def inline_includes(nodelist, engine):
+    '''Заменяет в дереве шаблона {% include %} простых шаблонов (в
+    которых не осталось своих include, extends и block) их телом. Так
+    include в цикле ленты не ищет шаблон и не открывает новое состояние
+    отрисовки для каждого поста. Взаимные include остаются как есть'''
+    for index, node in enumerate(nodelist):
+        if isinstance(node, IncludeNode):
+            name = included_name(node)
+            if name is None:
+                continue
+            included = engine.get_template(name)
+            if not included.nodelist.get_nodes_by_type(
+                (IncludeNode, ExtendsNode, BlockNode)
+            ):
+                nodelist[index] = InlinedIncludeNode(included.nodelist)
+            continue
+        for child in child_nodelists(node):
+            inline_includes(child, engine)
+
+
+class Loader(cached.Loader):
+    '''Кэширующий загрузчик, который один раз разбирает шаблон
+    и подставляет в него простые include'''
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        if not getattr(template, 'includes_inlined', False):
+            template.includes_inlined = True
+            inline_includes(template.nodelist, self.engine)
+        return template
+
+
+def preload():
+    '''Загружает и компилирует все шаблоны из DIRS, чтобы первые
+    запросы не разбирали их, а ошибки в шаблонах видны были при старте.
+    Возвращает число загруженных шаблонов'''
+    loaded = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for directory in backend.engine.dirs:
+            for root, _, files in os.walk(directory):
+                for file in files:
+                    if not file.endswith('.html'):
+                        continue
+                    name = os.path.relpath(
+                        os.path.join(root, file), directory
+                    )
+                    backend.engine.get_template(name.replace(os.sep, '/'))
+                    loaded += 1
+    return loaded
@@ -0,0 +1,45 @@
+from django import template
+from django.template.base import token_kwargs
+from django.utils.safestring import mark_safe
+
+from .. import fragments
+
+register = template.Library()
+
+
+class PersonalNode(template.Node):
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+
+    def render(self, context):
+        params = {
+            key: value.resolve(context) for key, value in self.params.items()
+        }
+        request = context.get('request')
+        if getattr(request, 'assemble_fragments', False):
+            return mark_safe(fragments.placeholder(self.name, params))
+        return fragments.render(request, self.name, params)
+
+
+@register.tag
+def personal(parser, token):
+    '''Часть страницы, которая зависит от зрителя:
+
+    {% personal "name" [key=value] ... %}
+
+    Под PersonalFragmentsMiddleware на ее месте остается метка, а сам
+    фрагмент рисуется при ответе, поэтому остальная страница одинакова
+    для всех и кэшируется целиком. Значения - числа и строки.
+    '''
+    bits = token.split_contents()
+    if len(bits) < 2 or bits[1][0] not in '"\'' or bits[1][-1] != bits[1][0]:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag requires a quoted fragment name.'
+        )
+    params = token_kwargs(bits[2:], parser)
+    if len(params) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]!r} tag accepts only key=value arguments.'
+        )
+    return PersonalNode(bits[1][1:-1], params)
@@ -0,0 +1,47 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..cache import get_or_compute
+
+register = template.Library()
+
+
+class SharedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on],
+        )
+        return get_or_compute(
+            key,
+            lambda: self.nodelist.render(context),
+            int(self.timeout.resolve(context)),
+        )
+
+
+@register.tag
+def shared_cache(parser, token):
+    '''Как {% cache %}, но фрагмент рендерит только один процесс,
+    а истекающий фрагмент обновляется заранее:
+
+    {% shared_cache timeout fragment_name [var1] [var2] ... %}
+    '''
+    nodelist = parser.parse(('endshared_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return SharedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
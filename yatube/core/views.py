@@ -1,5 +1,8 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
 
+from . import request_stats
+
 
 def page_not_found(request, exception):
     template = 'core/404.html'
@@ -37,3 +40,13 @@ def server_error(request):
         'title': title,
     }
     return render(request, template, context, status=500)
+
+
+@staff_member_required
+def request_stats_page(request):
+    template = 'core/request_stats.html'
+    context = {
+        'title': 'Статистика запросов',
+        'views': request_stats.summary(),
+    }
+    return render(request, template, context)
@@ -1,6 +1,11 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from . import export, search
+from .models import Comment, Follow, Group, Post, UserStats
+
+EXPORT_ACTIONS = (
+    export.admin_action(export.NDJSON), export.admin_action(export.CSV),
+)
 
 
 @admin.register(Post)
@@ -10,6 +15,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created',)
     list_editable = ('group',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        found = search.search(search_term, search.POSTS)
+        return queryset.filter(pk__in=found), False
 
 
 @admin.register(Group)
@@ -22,9 +34,25 @@ class CommentAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'post', 'author', 'text', 'created',)
     search_fields = ('text',)
     list_filter = ('created',)
+    actions = EXPORT_ACTIONS
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        found = search.search(search_term, search.COMMENTS)
+        return queryset.filter(pk__in=found), False
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
     search_fields = ('user', 'author')
+    actions = EXPORT_ACTIONS
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'posts_count', 'followers_count', 'following_count',
+    )
+    search_fields = ('user__username',)
@@ -0,0 +1,138 @@
+'''Медленные клиенты против WSGI и ASGI.
+
+Оба сервера выполняют представления в пуле из одного и того же числа
+потоков. Клиент шлет запрос и читает ответ с задержкой: поток
+WSGI-сервера ждет его все это время, а ASGI-приложение ждет в цикле
+событий и занимает поток только на время работы представления.
+'''
+import asyncio
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import close_old_connections
+
+from core.asgi import ASGIHandler, get_environ
+from .views import hot_pages, percentile
+
+
+def anonymous_pages():
+    return [url for url, viewer in hot_pages().values() if viewer is None]
+
+
+def http_scope(url):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+def serve_wsgi(handler, url, delay):
+    '''Поток WSGI-сервера: занят, пока клиент шлет запрос и читает ответ'''
+    time.sleep(delay)
+    response = handler(
+        get_environ(http_scope(url), BytesIO(), 0), lambda *args: None
+    )
+    try:
+        b''.join(response)
+        time.sleep(delay)
+    finally:
+        response.close()
+    return response.status_code
+
+
+async def request_asgi(app, url, delay):
+    '''Запрос медленного клиента к ASGI-приложению'''
+    status = None
+
+    async def receive():
+        await asyncio.sleep(delay)
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif not message.get('more_body', False):
+            await asyncio.sleep(delay)
+
+    await app(http_scope(url), receive, send)
+    return status
+
+
+def summary(durations, statuses, elapsed):
+    return {
+        'throughput_rps': round(len(durations) / elapsed, 1),
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'statuses': dict(statuses),
+    }
+
+
+def load_wsgi(urls, clients, requests, delay, threads):
+    handler = WSGIHandler()
+    durations = []
+    statuses = defaultdict(int)
+
+    def client(number, pool):
+        for request in range(requests):
+            url = urls[(number + request) % len(urls)]
+            started = time.perf_counter()
+            status = pool.submit(serve_wsgi, handler, url, delay).result()
+            durations.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool, \
+            ThreadPoolExecutor(max_workers=clients) as users:
+        list(users.map(client, range(clients), [pool] * clients))
+    return summary(durations, statuses, time.perf_counter() - started)
+
+
+def load_asgi(urls, clients, requests, delay, threads):
+    app = ASGIHandler(threads)
+    durations = []
+    statuses = defaultdict(int)
+
+    async def client(number):
+        for request in range(requests):
+            url = urls[(number + request) % len(urls)]
+            started = time.perf_counter()
+            status = await request_asgi(app, url, delay)
+            durations.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    async def main():
+        await asyncio.gather(*(client(number) for number in range(clients)))
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(main())
+    finally:
+        app.executor.shutdown()
+    return summary(durations, statuses, time.perf_counter() - started)
+
+
+def run(clients=100, requests=5, delay=0.05, threads=8):
+    '''Гоняет clients клиентов по requests запросов к анонимным горячим
+    страницам через WSGI и ASGI; delay - задержка клиента в секундах
+    на отправку запроса и на чтение ответа'''
+    urls = anonymous_pages()
+    close_old_connections()
+    report = {
+        'clients': clients,
+        'requests': clients * requests,
+        'delay_ms': round(delay * 1000),
+        'threads': threads,
+    }
+    for name, load in (('wsgi', load_wsgi), ('asgi', load_asgi)):
+        report[name] = load(urls, clients, requests, delay, threads)
+    return report
@@ -0,0 +1,128 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from .. import follows
+from ..models import Follow, User, UserStats
+from .views import percentile
+
+
+def participants(count):
+    '''Первые count пользователей базы: они и читатели, и авторы'''
+    return list(User.objects.order_by('pk')[:count])
+
+
+def snapshot(users):
+    '''Подписки участников друг на друга'''
+    ids = [user.pk for user in users]
+    followed = defaultdict(set)
+    for user_id, author_id in Follow.objects.filter(
+        user_id__in=ids, author_id__in=ids
+    ).values_list('user_id', 'author_id'):
+        followed[user_id].add(author_id)
+    return followed
+
+
+def restore(users, followed):
+    '''Возвращает подписки участников к снимку'''
+    ids = [user.pk for user in users]
+    for user in users:
+        follows.bulk_unfollow(user, ids)
+        follows.bulk_follow(user, followed[user.pk])
+
+
+def hammer(users, requests, seed):
+    '''Один поток: requests случайных подписок и отписок в узком кругу
+    участников, чтобы одинаковые запросы сталкивались между потоками'''
+    rng = random.Random(seed)
+    clients = {}
+    durations = []
+    statuses = defaultdict(int)
+    try:
+        for _ in range(requests):
+            reader, author = rng.sample(users, 2)
+            client = clients.get(reader.pk)
+            if client is None:
+                client = clients[reader.pk] = Client()
+                client.force_login(reader)
+            name = rng.choice(('posts:profile_follow',
+                               'posts:profile_unfollow'))
+            url = reverse(name, kwargs={'username': author.username})
+            started = time.perf_counter()
+            response = client.get(url)
+            durations.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+    return durations, statuses
+
+
+def check(users):
+    '''Нарушения инвариантов: дубли подписок и разъехавшиеся счетчики'''
+    ids = [user.pk for user in users]
+    duplicates = Follow.objects.values('user_id', 'author_id').annotate(
+        total=Count('pk')
+    ).filter(total__gt=1).count()
+    following = dict(Follow.objects.filter(user_id__in=ids).values(
+        'user_id'
+    ).annotate(total=Count('pk')).values_list('user_id', 'total'))
+    followers = dict(Follow.objects.filter(author_id__in=ids).values(
+        'author_id'
+    ).annotate(total=Count('pk')).values_list('author_id', 'total'))
+    stale = [
+        user_id for user_id, following_count, followers_count
+        in UserStats.objects.filter(user_id__in=ids).values_list(
+            'user_id', 'following_count', 'followers_count'
+        )
+        if following_count != following.get(user_id, 0)
+        or followers_count != followers.get(user_id, 0)
+    ]
+    return {'duplicates': duplicates, 'stale_counters': sorted(stale)}
+
+
+def run(threads=8, requests=100, users=5, seed=0):
+    '''Бьет конкурентными подписками по текущей базе, затем
+    возвращает подписки участников к исходному состоянию'''
+    users = participants(users)
+    if len(users) < 2:
+        raise ValueError('Нужно хотя бы два пользователя')
+    followed = snapshot(users)
+    try:
+        started = time.perf_counter()
+        if threads == 1:
+            results = [hammer(users, requests, seed)]
+        else:
+            close_old_connections()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(
+                    hammer,
+                    [users] * threads,
+                    [requests] * threads,
+                    range(seed, seed + threads),
+                ))
+        elapsed = time.perf_counter() - started
+        durations = [value for result, _ in results for value in result]
+        statuses = defaultdict(int)
+        for _, result in results:
+            for status, total in result.items():
+                statuses[status] += total
+        return {
+            'threads': threads,
+            'requests': len(durations),
+            'throughput_rps': round(len(durations) / elapsed, 1),
+            'p50_ms': round(percentile(durations, 50), 3),
+            'p95_ms': round(percentile(durations, 95), 3),
+            'statuses': dict(statuses),
+            **check(users),
+        }
+    finally:
+        # подписки настоящих пользователей возвращаются и при ошибке
+        restore(users, followed)
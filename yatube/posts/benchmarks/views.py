@@ -0,0 +1,133 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+def percentile(values, percent):
+    '''Перцентиль по методу ближайшего ранга'''
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def busiest(queryset, relation):
+    return queryset.annotate(
+        total=Count(relation)
+    ).order_by('-total', 'pk').first()
+
+
+def hot_pages():
+    '''Адреса горячих страниц на самых нагруженных объектах базы'''
+    pages = {'index': (reverse('posts:posts_main'), None)}
+    group = busiest(Group.objects.all(), 'posts')
+    if group is not None:
+        pages['group_posts'] = (
+            reverse('posts:posts_group', kwargs={'slug': group.slug}), None
+        )
+    author = busiest(User.objects.all(), 'posts')
+    if author is not None:
+        pages['profile'] = (
+            reverse('posts:profile', kwargs={'username': author.username}),
+            None,
+        )
+    post = busiest(Post.objects.all(), 'comments')
+    if post is not None:
+        pages['post_detail'] = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}), None
+        )
+    reader = busiest(User.objects.all(), 'follower')
+    if reader is not None:
+        pages['follow_index'] = (reverse('posts:follow_index'), reader)
+    return pages
+
+
+@contextmanager
+def record_queries():
+    '''Собирает (sql, params) всех запросов внутри блока'''
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def fetched_rows(queries):
+    '''Сколько строк вернули SELECT-запросы'''
+    rows = 0
+    with connection.cursor() as cursor:
+        for sql, params in queries:
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            cursor.execute(
+                f'SELECT COUNT(*) FROM ({sql}) AS fetched', params
+            )
+            rows += cursor.fetchone()[0]
+    return rows
+
+
+def benchmark_page(client, url, requests, warm_cache):
+    for _ in range(3):
+        client.get(url)
+    durations = []
+    for _ in range(requests):
+        if not warm_cache:
+            cache.clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        durations.append((time.perf_counter() - started) * 1000)
+    if not warm_cache:
+        cache.clear()
+    with record_queries() as queries:
+        client.get(url)
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+        'mean_ms': round(sum(durations) / len(durations), 3),
+        'queries': len(queries),
+        'rows': fetched_rows(queries),
+    }
+
+
+def run(requests=50, warm_cache=False):
+    '''Прогоняет горячие страницы через тестовый клиент'''
+    results = {}
+    for name, (url, viewer) in hot_pages().items():
+        client = Client()
+        if viewer is not None:
+            client.force_login(viewer)
+        results[name] = benchmark_page(client, url, requests, warm_cache)
+    return results
+
+
+def regressions(results, baseline, threshold):
+    '''Страницы, где p50 вырос больше чем в threshold раз
+    или стало больше запросов и прочитанных строк'''
+    found = {}
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        limits = {
+            'p50_ms': old['p50_ms'] * threshold,
+            'queries': old['queries'],
+            'rows': old['rows'],
+        }
+        for metric, limit in limits.items():
+            if result[metric] > limit:
+                found.setdefault(name, {})[metric] = (
+                    old[metric], result[metric]
+                )
+    return found
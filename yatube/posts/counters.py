@@ -0,0 +1,72 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def change_counter(model, pk, field, delta):
+    '''Атомарно сдвигает счетчик field у объекта pk на delta.
+
+    Счетчик не уходит ниже нуля: если он уже разъехался с данными,
+    его исправит команда rebuild_counters.
+    '''
+    if pk is None:
+        return 0
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    '''Как change_counter, но создает UserStats при первом обращении'''
+    if user_id is None:
+        return
+    if not change_counter(UserStats, user_id, field, delta) and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        change_counter(UserStats, user_id, field, delta)
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def recount_follows(user_ids):
+    '''Пересчитывает подписки и подписчиков пользователей по таблице'''
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        followers_count=_count_subquery(Follow.objects.all(), 'author'),
+        following_count=_count_subquery(Follow.objects.all(), 'user'),
+    )
+
+
+def rebuild_counters():
+    '''Пересчитывает все денормализованные счетчики по данным таблиц'''
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id) for user_id in
+            User.objects.filter(stats__isnull=True).values_list(
+                'pk', flat=True
+            )
+        ],
+    )
+    UserStats.objects.update(
+        posts_count=_count_subquery(Post.objects.all(), 'author'),
+        followers_count=_count_subquery(Follow.objects.all(), 'author'),
+        following_count=_count_subquery(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(
+        posts_count=_count_subquery(Post.objects.all(), 'group')
+    )
+    Post.objects.update(
+        comments_count=_count_subquery(Comment.objects.all(), 'post')
+    )
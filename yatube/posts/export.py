@@ -0,0 +1,255 @@
+import csv
+import datetime as dt
+import gzip
+import json
+import os
+import zlib
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Comment, Follow, Post
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = (NDJSON, CSV)
+CONTENT_TYPES = {NDJSON: 'application/x-ndjson', CSV: 'text/csv'}
+
+# Выгружаемые колонки: имя в выгрузке -> поле модели
+COLUMNS = {
+    Post: {
+        'id': 'id',
+        'created': 'created',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+    },
+    Comment: {
+        'id': 'id',
+        'created': 'created',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+    },
+    Follow: {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+GROUP_LOOKUPS = {Post: 'group__slug', Comment: 'post__group__slug'}
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def day_start(day):
+    return timezone.make_aware(dt.datetime.combine(day, dt.time.min))
+
+
+def filter_rows(queryset, author=None, group=None, since=None, until=None,
+                after_id=None):
+    '''Фильтры выгрузки. Даты since и until включаются целиком'''
+    model = queryset.model
+    filters = {}
+    if author is not None:
+        filters['author__username'] = author
+    if group is not None:
+        if model not in GROUP_LOOKUPS:
+            raise ValueError('Подписки не фильтруются по группе')
+        filters[GROUP_LOOKUPS[model]] = group
+    if since is not None or until is not None:
+        if model is Follow:
+            raise ValueError('У подписок нет даты создания')
+        if since is not None:
+            filters['created__gte'] = day_start(since)
+        if until is not None:
+            filters['created__lt'] = day_start(until + dt.timedelta(days=1))
+    if after_id is not None:
+        filters['pk__gt'] = after_id
+    return queryset.filter(**filters)
+
+
+def rows(queryset, chunk_size=None):
+    '''Словари выгружаемых колонок по возрастанию id.
+
+    iterator() читает строки порциями по chunk_size и не кэширует их,
+    поэтому память не зависит от размера таблицы.
+    '''
+    columns = COLUMNS[queryset.model]
+    values = queryset.order_by('pk').values_list(
+        *columns.values()
+    ).iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+    for row in values:
+        yield dict(zip(columns, row))
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class Echo:
+    '''Файл для csv.writer, который возвращает записанную строку'''
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns, header=True):
+    writer = csv.writer(Echo())
+    if header:
+        yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            encoder.default(value)
+            if isinstance(value, dt.datetime) else value
+            for value in row.values()
+        ])
+
+
+def lines(model, rows, format, header=True):
+    '''Строки выгрузки в формате format'''
+    if format == NDJSON:
+        return ndjson_lines(rows)
+    return csv_lines(rows, list(COLUMNS[model]), header)
+
+
+def open_text(path, mode='rt'):
+    '''Файл выгрузки; .gz открывается через gzip'''
+    if path.endswith('.gz'):
+        return gzip.open(
+            path, mode, compresslevel=6, encoding='utf-8', newline=''
+        )
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+class CompleteLines:
+    '''Итератор (строка, смещение ее конца) целых строк бинарного файла.
+
+    Оборванный хвост прерванной выгрузки - строку без перевода строки,
+    разрезанный символ, сжатый поток без конца - итератор пропускает,
+    а clean остается False.
+    '''
+
+    def __init__(self, file):
+        self.file = file
+        self.clean = False
+
+    def __iter__(self):
+        offset = 0
+        try:
+            for raw in self.file:
+                if not raw.endswith(b'\n'):
+                    return
+                try:
+                    line = raw.decode('utf-8')
+                except UnicodeDecodeError:
+                    return
+                offset += len(raw)
+                yield line, offset
+        except (EOFError, OSError, zlib.error):
+            return
+        self.clean = True
+
+
+def scan_ndjson(lines):
+    last = None
+    kept = 0
+    for line, end in lines:
+        if line.strip():
+            try:
+                last = json.loads(line)['id']
+            except (ValueError, KeyError, TypeError):
+                return last, kept, False
+        kept = end
+    return last, kept, lines.clean
+
+
+def scan_csv(lines):
+    # текст в CSV может занимать несколько строк файла, поэтому конец
+    # записи - конец последней строки, прочитанной csv.reader
+    last = None
+    kept = 0
+    position = 0
+
+    def tracked():
+        nonlocal position
+        for line, end in lines:
+            position = end
+            yield line
+
+    try:
+        for row in csv.reader(tracked(), strict=True):
+            if row and row[0].isdigit():
+                last = int(row[0])
+            kept = position
+    except csv.Error:
+        # запись оборвалась внутри кавычек
+        return last, kept, False
+    return last, kept, lines.clean
+
+
+def scan(file, format):
+    '''(id последней целой записи выгрузки, смещение конца этой записи
+    в несжатых данных, дочитан ли файл без обрывов)'''
+    lines = CompleteLines(file)
+    if format == NDJSON:
+        return scan_ndjson(lines)
+    return scan_csv(lines)
+
+
+def recover(path, format):
+    '''Готовит выгрузку к дозаписи: отрезает неполную последнюю запись,
+    оставленную прерванной выгрузкой, и возвращает (id последней целой
+    записи или None, сколько байт данных в файле осталось).
+
+    Обычный файл обрезается на месте. Сжатый нельзя обрезать по
+    несжатому смещению, поэтому поврежденный архив пересжимается до
+    конца последней записи; дозапись станет следующим членом архива.
+    '''
+    compressed = path.endswith('.gz')
+    opener = gzip.open if compressed else open
+    with opener(path, 'rb') as file:
+        last, kept, clean = scan(file, format)
+    if not compressed:
+        if os.path.getsize(path) > kept:
+            os.truncate(path, kept)
+    elif not clean:
+        rewrite_gzip(path, kept)
+    return last, kept
+
+
+def rewrite_gzip(path, size):
+    '''Пересжимает первые size байт данных архива path'''
+    temporary = f'{path}.recover'
+    with gzip.open(path, 'rb') as source, \
+            gzip.open(temporary, 'wb', compresslevel=6) as target:
+        while size:
+            chunk = source.read(min(size, 64 * 1024))
+            if not chunk:
+                break
+            target.write(chunk)
+            size -= len(chunk)
+    os.replace(temporary, path)
+
+
+def admin_action(format):
+    '''Действие админки: выбранные объекты файлом в формате format'''
+    def action(modeladmin, request, queryset):
+        model = queryset.model
+        response = StreamingHttpResponse(
+            lines(model, rows(queryset), format),
+            content_type=CONTENT_TYPES[format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{model._meta.model_name}.{format}"'
+        )
+        return response
+
+    action.__name__ = f'export_{format}'
+    action.short_description = f'Выгрузить в {format.upper()}'
+    return action
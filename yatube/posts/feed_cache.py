@@ -0,0 +1,151 @@
+import hashlib
+import time
+import uuid
+from functools import partial, wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from yatube.settings import FEED_CACHE_TIMEOUT
+
+INDEX = 'index'
+GROUP = 'group'
+PROFILE = 'profile'
+FOLLOW = 'follow'
+COMMENTS = 'comments'
+
+GENERATION_KEY = 'feed-generation:{}:{}'
+
+
+def _generation_key(feed, obj_id):
+    return GENERATION_KEY.format(feed, obj_id or '')
+
+
+def get_generations(*feeds):
+    '''Поколения лент, переданных парами (feed, obj_id): пары
+    (uuid, время создания). Поколение меняется при любом изменении
+    ленты, поэтому годится и для ключей кэша, и для валидаторов HTTP'''
+    keys = [_generation_key(feed, obj_id) for feed, obj_id in feeds]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generation = (uuid.uuid4().hex, time.time())
+            if not cache.add(key, generation, None):
+                generation = cache.get(key, generation)
+            generations[key] = generation
+    return [generations[key] for key in keys]
+
+
+def get_fragment_key(request, feed, obj_id=None, personal=False,
+                     sources=()):
+    '''Ключ фрагмента ленты для {% cache %}.
+
+    Ключ зависит от поколения ленты, курсора страницы, а для
+    personal-лент - и от зрителя; в остальных лентах части, зависящие
+    от зрителя, вынесены в {% personal %}. Смена поколения делает все
+    старые фрагменты ленты недостижимыми.
+
+    sources - ленты (feed, obj_id), из постов которых собрана лента:
+    их поколения тоже входят в ключ. Так лента подписок зависит от лент
+    профилей своих авторов, и пост сбрасывает ленты всех подписчиков
+    одной записью в кэш.
+    '''
+    generations = get_generations((feed, obj_id), *sources)
+    generation = generations[0][0]
+    if sources:
+        generation = hashlib.md5(':'.join(
+            generation for generation, _ in generations
+        ).encode()).hexdigest()
+    viewer = request.user.pk if personal else ''
+    return ':'.join((
+        feed,
+        str(obj_id or ''),
+        generation,
+        request.GET.get('cursor', ''),
+        str(viewer),
+    ))
+
+
+def invalidate(*feeds):
+    '''Сбрасывает фрагменты лент, переданных парами (feed, obj_id).
+
+    Поколение меняется сразу и еще раз после коммита текущей транзакции:
+    до коммита другой запрос или реплика видят старые данные и могли
+    собрать из них фрагмент уже под новым поколением.
+    '''
+    keys = [_generation_key(feed, obj_id) for feed, obj_id in feeds]
+    cache.delete_many(keys)
+    transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def invalidate_post(post, *group_ids):
+    '''Сбрасывает ленты, в которых показывается пост; ленты подписок
+    читателей автора зависят от его ленты профиля'''
+    invalidate(
+        (INDEX, None),
+        (PROFILE, post.author_id),
+        *((GROUP, group_id) for group_id in group_ids if group_id),
+    )
+
+
+def feed_cache_context(request, feed, obj_id=None, personal=False,
+                       sources=()):
+    return {
+        'feed_cache_key': get_fragment_key(
+            request, feed, obj_id, personal, sources
+        ),
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+    }
+
+
+def page_version(get_feeds, request, *args, **kwargs):
+    '''Версия страницы для ETag и кэша страниц: (etag, last_modified)
+    или None, если страница не собирается из лент'''
+    feeds = get_feeds(request, *args, **kwargs)
+    if feeds is None:
+        return None
+    generations = get_generations(*feeds)
+    viewer = request.user.pk if request.user.is_authenticated else ''
+    etag = quote_etag(hashlib.md5(':'.join((
+        *(generation for generation, _ in generations),
+        str(viewer),
+    )).encode()).hexdigest())
+    return etag, int(max(modified for _, modified in generations))
+
+
+def conditional(get_feeds):
+    '''Добавляет странице ETag и Last-Modified и отвечает 304,
+    не вызывая представление, если страница не менялась.
+
+    get_feeds(request, *args, **kwargs) возвращает пары (feed, obj_id)
+    лент, из которых собрана страница, или None, если страницу нужно
+    отдать целиком (например, объекта нет и будет 404). Страница
+    зависит и от зрителя, поэтому он тоже входит в ETag.
+
+    Та же версия доступна как атрибут page_version представления: по ней
+    SharedPageCacheMiddleware кэширует общую часть страницы целиком.
+    '''
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version = page_version(get_feeds, request, *args, **kwargs)
+            if version is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = version
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_vary_headers(response, ('Cookie',))
+            return response
+        wrapper.page_version = partial(page_version, get_feeds)
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+import uuid
+from contextvars import ContextVar
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import feed_cache, timelines
+from .counters import change_user_counter, recount_follows
+from .models import Follow, User
+
+FOLLOWED_KEY = 'followed-authors:{}:{}'
+FOLLOWED_VERSION_KEY = 'followed-authors-version:{}'
+
+_counting_deletes = ContextVar('counting_deletes', default=False)
+
+
+def get_version(user_id):
+    key = FOLLOWED_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_followed_ids(user):
+    '''Множество id авторов, на которых подписан пользователь.
+
+    Множество хранится под версией, прочитанной до запроса к базе:
+    если подписка сменила версию, пока множество собиралось, устаревший
+    ответ запишется под старой версией, и его никто не прочтет.
+    '''
+    if not user.is_authenticated:
+        return frozenset()
+    key = FOLLOWED_KEY.format(user.pk, get_version(user.pk))
+    followed = cache.get(key)
+    if followed is None:
+        followed = frozenset(Follow.objects.filter(
+            user_id=user.pk
+        ).values_list('author_id', flat=True))
+        cache.set(key, followed, settings.FOLLOWED_CACHE_TIMEOUT)
+    return followed
+
+
+def followed_ids(request):
+    '''То же для зрителя запроса: кэш читается один раз за запрос'''
+    if not hasattr(request, '_followed_ids'):
+        request._followed_ids = get_followed_ids(request.user)
+    return request._followed_ids
+
+
+def set_version(user_id):
+    cache.set(FOLLOWED_VERSION_KEY.format(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate(user_id):
+    '''Меняет версию сразу и после коммита, как feed_cache.invalidate'''
+    set_version(user_id)
+    transaction.on_commit(partial(set_version, user_id))
+
+
+def follow(user, author):
+    '''Подписывает user на author. Повторная подписка и подписка на
+    себя ничего не делают. Возвращает True, если подписка появилась'''
+    if user.pk == author.pk:
+        return False
+    # get_or_create сначала ищет подписку, поэтому повторный клик
+    # не пытается вставить дубль; гонку двух вставок он разрешает сам
+    _, created = Follow.objects.get_or_create(user=user, author=author)
+    return created
+
+
+def counting_deletes():
+    '''True, пока unfollow или bulk_unfollow сами ведут счетчики
+    удаляемых подписок'''
+    return _counting_deletes.get()
+
+
+def unfollow(user, author):
+    '''Отписывает user от author. Возвращает True, если подписка была.
+
+    post_delete приходит за каждую найденную подписку, даже если
+    одновременная отписка уже удалила строку, поэтому счетчики
+    сдвигаются на число действительно удаленных строк.
+    '''
+    token = _counting_deletes.set(True)
+    try:
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+    finally:
+        _counting_deletes.reset(token)
+    if deleted:
+        change_user_counter(user.pk, 'following_count', -deleted)
+        change_user_counter(author.pk, 'followers_count', -deleted)
+    return bool(deleted)
+
+
+def bulk_follow(user, author_ids):
+    '''Подписывает user на всех существующих авторов из списка одним
+    INSERT без ошибок на уже существующих подписках. Возвращает число
+    новых подписок'''
+    author_ids = set(author_ids) - {user.pk}
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        new_ids = sorted(User.objects.filter(
+            pk__in=author_ids - existing
+        ).values_list('pk', flat=True))
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author_id) for author_id in new_ids],
+            ignore_conflicts=True,
+        )
+        # bulk_create не шлет сигналов: счетчики, ленты и кэш обновляются
+        # здесь, счетчики - пересчетом, чтобы не сбиться на пропущенных
+        # из-за гонки строках
+        recount_follows([user.pk, *new_ids])
+        for author_id in new_ids:
+            timelines.backfill(user.pk, author_id)
+    feed_cache.invalidate((feed_cache.FOLLOW, user.pk))
+    invalidate(user.pk)
+    return len(new_ids)
+
+
+def bulk_unfollow(user, author_ids):
+    '''Отписывает user от авторов из списка. Возвращает число удаленных
+    подписок.
+
+    Как и в unfollow, post_delete счетчики не сдвигает: они
+    пересчитываются один раз для всех затронутых пользователей,
+    как в bulk_follow.
+    '''
+    with transaction.atomic():
+        rows = Follow.objects.filter(user=user, author_id__in=set(author_ids))
+        removed_ids = list(rows.values_list('author_id', flat=True))
+        token = _counting_deletes.set(True)
+        try:
+            deleted, _ = rows.delete()
+        finally:
+            _counting_deletes.reset(token)
+        recount_follows([user.pk, *removed_ids])
+    return deleted
@@ -1,4 +1,7 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
 from .models import Post, Comment
 
@@ -29,6 +32,22 @@ class PostForm(forms.ModelForm):
             })
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        if image.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError(
+                'Файл слишком большой, допустимо не больше '
+                f'{filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)}'
+            )
+        width, height = image.image.size
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            raise forms.ValidationError(
+                'Слишком большое разрешение изображения'
+            )
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,45 @@
+from django.template.loader import render_to_string
+
+from core import fragments
+from . import follows
+from .forms import CommentForm
+
+
+@fragments.register('switcher')
+def switcher(request):
+    return render_to_string('includes/switcher.html', request=request)
+
+
+@fragments.register('follow_button')
+def follow_button(request, author_id, username):
+    '''Кнопка подписки в профиле автора'''
+    return render_to_string('includes/follow_button.html', {
+        'following': author_id in follows.followed_ids(request),
+        'username': username,
+    }, request)
+
+
+@fragments.register('post_actions')
+def post_actions(request, author_id, username):
+    '''Ссылка подписки на автора на странице поста'''
+    return render_to_string('includes/post_actions.html', {
+        'following': author_id in follows.followed_ids(request),
+        'is_author': author_id == request.user.pk,
+        'username': username,
+    }, request)
+
+
+@fragments.register('post_edit')
+def post_edit(request, post_id, author_id):
+    return render_to_string('includes/post_edit.html', {
+        'editable': author_id == request.user.pk,
+        'post_id': post_id,
+    }, request)
+
+
+@fragments.register('comment_form')
+def comment_form(request, post_id):
+    return render_to_string('includes/comment_form.html', {
+        'form': CommentForm(),
+        'post_id': post_id,
+    }, request)
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageOps
+
+from . import feed_cache, thumbnails
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TO = Post._meta.get_field('image').upload_to
+# Обработанная картинка называется хэшем содержимого исходного файла
+PROCESSED_PATTERN = rf'^{re.escape(UPLOAD_TO)}[0-9a-f]{{64}}\.[a-z]+$'
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}
+
+
+def is_processed(name):
+    return re.match(PROCESSED_PATTERN, name) is not None
+
+
+def content_hash(file):
+    '''sha256 файла, прочитанного по частям'''
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def processed_name(digest):
+    extension = EXTENSIONS.get(settings.IMAGE_FORMAT, 'img')
+    return f'{UPLOAD_TO}{digest}.{extension}'
+
+
+def encode(file):
+    '''Уменьшает картинку до IMAGE_MAX_SIDE и пережимает в IMAGE_FORMAT.
+
+    Метаданные (EXIF с геолокацией и т.п.) не переносятся, но поворот
+    из них применяется к самим пикселям.
+    '''
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        alpha = (
+            image.mode in ('RGBA', 'LA', 'PA')
+            or 'transparency' in image.info
+        )
+        image = image.convert(
+            'RGBA' if alpha and settings.IMAGE_FORMAT != 'JPEG' else 'RGB'
+        )
+        side = settings.IMAGE_MAX_SIDE
+        image.thumbnail((side, side), Image.LANCZOS)
+        output = BytesIO()
+        image.save(
+            output, settings.IMAGE_FORMAT,
+            quality=settings.IMAGE_QUALITY, optimize=True,
+        )
+    return output.getvalue()
+
+
+def publish(storage, name, content):
+    '''Кладет content под именем name, если такого файла еще нет.
+
+    Одинаковые загрузки могут обрабатываться одновременно в разных
+    процессах. Файл пишется во временный рядом, а под своим именем
+    появляется через os.link, который не перезаписывает существующий:
+    выигрывает одна обработка, остальные берут ее файл.
+    '''
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        # у хранилищ без локальных путей атомарного создания нет
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(content))
+        return name
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temp:
+        temp.write(content)
+    try:
+        os.chmod(temp.name, storage.file_permissions_mode or 0o644)
+        os.link(temp.name, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(temp.name)
+    return name
+
+
+def store(image):
+    '''Сохраняет обработанную картинку и возвращает ее имя'''
+    storage = image.storage
+    with storage.open(image.name) as file:
+        digest = content_hash(file)
+    name = processed_name(digest)
+    if storage.exists(name):
+        return name
+    with storage.open(image.name) as file:
+        content = encode(file)
+    return publish(storage, name, content)
+
+
+def process(post_id):
+    '''Заменяет загруженный оригинал поста обработанной картинкой
+    и готовит миниатюры.
+
+    Одинаковые загрузки дают один хэш, поэтому файл хранится один раз,
+    а оригинал удаляется, как только на него никто не ссылается.
+    Повторный вызов только доделывает миниатюры.
+    '''
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id'
+    ).first()
+    if post is None or not post.image:
+        return
+    original = post.image.name
+    if not is_processed(original):
+        # без сигналов, а проверка прежнего имени не даст затереть
+        # картинку, замененную за это время
+        if not Post.objects.filter(pk=post_id, image=original).update(
+            image=store(post.image)
+        ):
+            return
+        # ленты ссылаются на оригинал, который сейчас будет удален
+        feed_cache.invalidate_post(post, post.group_id)
+        if not Post.objects.filter(image=original).exists():
+            post.image.storage.delete(original)
+    thumbnails.generate(post_id)
+
+
+def run(post_id):
+    '''Задача пула: своя сессия с базой и ошибки только в лог'''
+    close_old_connections()
+    try:
+        thumbnails.retry_locked(process, post_id)
+    except Exception:
+        logger.exception('Не удалось обработать картинку поста %s', post_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,43 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from posts.benchmarks import asgi as benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность WSGI и ASGI под множеством '
+        'медленных клиентов на анонимных горячих страницах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=5,
+            help='Число запросов на клиента',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=50,
+            help='Задержка клиента на запрос и на ответ, мс',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.ASGI_THREADS,
+            help='Потоков сервера, выполняющих представления',
+        )
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=False):
+            report = benchmark.run(
+                options['clients'], options['requests'],
+                options['delay'] / 1000, options['threads'],
+            )
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from posts.benchmarks import follows as benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность подписок и отписок под '
+        'конкурентными запросами и проверяет, что не появилось дублей '
+        'и счетчики сошлись. Подписки участников затем восстанавливаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Число запросов на поток',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=5,
+            help='Сколько пользователей подписываются друг на друга',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with override_settings(DEBUG=False):
+                report = benchmark.run(
+                    options['threads'], options['requests'],
+                    options['users'], options['seed'],
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+        if report['duplicates'] or report['stale_counters']:
+            raise CommandError('Нарушены инварианты подписок')
@@ -0,0 +1,88 @@
+import json
+import subprocess
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from posts.benchmarks import views as benchmark
+from posts.models import Comment, Follow, Post, User
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95, число запросов и прочитанных строк горячих '
+        'страниц на данных текущей базы (см. seed_yatube) и пишет JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Не очищать кэш перед запросами',
+        )
+        parser.add_argument('--output', help='Файл для результатов JSON')
+        parser.add_argument(
+            '--compare',
+            help='JSON предыдущего прогона для поиска регрессий',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=1.2,
+            help='Во сколько раз может вырасти p50 без регрессии',
+        )
+
+    def handle(self, *args, **options):
+        with override_settings(DEBUG=False):
+            results = benchmark.run(
+                options['requests'], options['warm_cache']
+            )
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'created': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'warm_cache': options['warm_cache'],
+                'dataset': {
+                    'users': User.objects.count(),
+                    'posts': Post.objects.count(),
+                    'comments': Comment.objects.count(),
+                    'follows': Follow.objects.count(),
+                },
+            },
+            'views': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)['views']
+            found = benchmark.regressions(
+                results, baseline, options['threshold']
+            )
+            if found:
+                raise CommandError(
+                    f'Регрессии: {json.dumps(found, ensure_ascii=False)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
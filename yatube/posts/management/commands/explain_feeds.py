@@ -0,0 +1,86 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.paginators import CursorPaginator, after
+from posts import timelines
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, User
+)
+from yatube.settings import POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы и время горячих запросов лент. Запустите до и '
+        'после миграции с индексами на одних и тех же данных, чтобы '
+        'сравнить результаты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Сколько раз выполнять каждый запрос для замера времени',
+        )
+
+    def busiest(self, queryset, relation):
+        return queryset.annotate(
+            total=Count(relation)
+        ).order_by('-total').values_list('pk', flat=True).first()
+
+    def hot_queries(self):
+        author_id = self.busiest(User.objects.all(), 'posts')
+        group_id = self.busiest(Group.objects.all(), 'posts')
+        post_id = self.busiest(Post.objects.all(), 'comments')
+        reader = User.objects.filter(
+            pk=self.busiest(User.objects.all(), 'follower')
+        ).first()
+        feed = CursorPaginator.ordering
+        queries = {
+            'index': Post.objects.feed().order_by(*feed),
+            'group_posts': Post.objects.feed().filter(
+                group_id=group_id
+            ).order_by(*feed),
+            'profile': Post.objects.feed().filter(
+                author_id=author_id
+            ).order_by(*feed),
+            'post_detail comments': Comment.objects.filter(
+                post_id=post_id
+            ).order_by(*feed),
+            'followers of author': Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True),
+        }
+        if reader is not None:
+            queries['follow_index timeline'] = after(
+                TimelineEntry.objects.filter(user=reader), None, 'post_id'
+            ).values_list('post_id', 'created')
+            on_fly = timelines.read_on_fly(reader.pk)
+            if on_fly is not None:
+                # без популярных авторов и длинной истории подписок этот
+                # запрос не выполняется
+                queries['follow_index read on fly'] = after(
+                    Post.objects.filter(on_fly), None
+                ).values_list('id', 'created')
+        return queries
+
+    def timing(self, queryset, repeat):
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset[:POSTS_PER_PAGE + 1])
+            durations.append((time.perf_counter() - started) * 1000)
+        return statistics.median(durations)
+
+    def handle(self, *args, **options):
+        for name, queryset in self.hot_queries().items():
+            page = queryset[:POSTS_PER_PAGE + 1]
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(page.explain())
+            self.stdout.write(
+                f'median {self.timing(queryset, options["repeat"]):.2f} ms\n'
+            )
@@ -0,0 +1,101 @@
+import datetime as dt
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в NDJSON или CSV '
+        'потоком, не держа таблицу в памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=list(export.MODELS), default='posts',
+            help='Что выгружать',
+        )
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default=export.NDJSON,
+        )
+        parser.add_argument('--author', help='Логин автора')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--since', type=dt.date.fromisoformat,
+            help='Первый день выгрузки, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument(
+            '--until', type=dt.date.fromisoformat,
+            help='Последний день выгрузки, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument(
+            '--after-id', type=int, help='Выгружать записи с id больше',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл выгрузки (по умолчанию stdout); .gz сжимается',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Дописать --output с записи после последней выгруженной',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        model = export.MODELS[options['kind']]
+        output = options['output']
+        after_id = options['after_id']
+        resume = (
+            options['resume'] and output is not None
+            and os.path.exists(output)
+        )
+        if options['resume'] and output is None:
+            raise CommandError('--resume работает только с --output')
+        header = True
+        if resume:
+            # прерванная выгрузка могла оборваться посреди записи
+            last_id, kept = export.recover(output, options['format'])
+            if last_id is not None:
+                after_id = last_id
+            # заголовок CSV пишется, только если его нет в файле
+            header = not kept
+        try:
+            queryset = export.filter_rows(
+                model.objects.all(),
+                author=options['author'],
+                group=options['group'],
+                since=options['since'],
+                until=options['until'],
+                after_id=after_id,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.last_id = after_id
+        lines = export.lines(
+            model,
+            self.track(export.rows(queryset, options['chunk_size'])),
+            options['format'],
+            header=header,
+        )
+        if output is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+        else:
+            # gzip допускает дозапись: новые данные станут еще одним
+            # членом архива, и распаковка прочитает их подряд
+            with export.open_text(output, 'at' if resume else 'wt') as file:
+                file.writelines(lines)
+        self.stderr.write(f'Последний выгруженный id: {self.last_id}')
+
+    def track(self, rows):
+        '''Запоминает id последней выгруженной записи'''
+        for row in rows:
+            self.last_id = row['id']
+            yield row
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры для постов с картинками, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры всех постов с картинками',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько потоков готовят миниатюры (0 - без пула)',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            missing = Q()
+            for field in settings.THUMBNAIL_GEOMETRIES:
+                missing |= Q(**{field: ''})
+            posts = posts.filter(missing)
+        post_ids = list(posts.order_by('pk').values_list('pk', flat=True))
+        if options['workers']:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                list(executor.map(thumbnails.run, post_ids))
+        else:
+            for post_id in post_ids:
+                thumbnails.run(post_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры подготовлены для постов: {len(post_ids)}'
+        ))
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Уменьшает и пережимает картинки постов, загруженные до появления '
+        'обработки, и заодно убирает повторы одинаковых файлов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько потоков обрабатывают картинки (0 - без пула)',
+        )
+
+    def handle(self, *args, **options):
+        post_ids = list(
+            Post.objects.exclude(image='').exclude(
+                image__regex=images.PROCESSED_PATTERN
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+        if options['workers']:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                list(executor.map(images.run, post_ids))
+        else:
+            for post_id in post_ids:
+                images.run(post_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработаны картинки постов: {len(post_ids)}'
+        ))
@@ -0,0 +1,245 @@
+import bisect
+import datetime as dt
+import itertools
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts import search
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+USERNAME_PREFIX = 'seed'
+# Фиксированный конец шкалы времени, чтобы прогоны совпадали целиком
+TIMELINE_END = dt.datetime(2022, 1, 1, tzinfo=timezone.utc)
+WORDS = (
+    'яндекс', 'практикум', 'джанго', 'пост', 'лента', 'автор', 'группа',
+    'подписка', 'комментарий', 'сегодня', 'вчера', 'город', 'кофе', 'код',
+    'тест', 'релиз', 'ночь', 'утро', 'дорога', 'книга', 'фильм', 'музыка',
+    'погода', 'отпуск', 'работа', 'кот', 'собака', 'море', 'горы', 'идея',
+    'и', 'в', 'на', 'с', 'по', 'не', 'что', 'как', 'это', 'очень',
+)
+
+
+@contextmanager
+def explicit_created(*models):
+    '''Позволяет bulk_create сохранить заданное значение created'''
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def zipf_weights(count, alpha):
+    '''Накопленные веса степенного распределения для random.choices'''
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу детерминированным набором пользователей, групп, '
+        'постов, комментариев и подписок для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Среднее число подписок на пользователя',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--password',
+            default='yatube-seed',
+            help='Общий пароль созданных пользователей',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        if User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).exists():
+            raise CommandError(
+                'В базе уже есть сгенерированные пользователи, '
+                'очистите ее перед повторным заполнением'
+            )
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        with transaction.atomic(), explicit_created(Post, Comment):
+            users = self.create_users(options['users'], options['password'])
+            groups = self.create_groups(options['groups'])
+            posts = self.create_posts(
+                options['posts'], users, groups, options['days']
+            )
+            self.create_comments(options['comments'], users, posts)
+            follows = self.create_follows(options['follows'], users)
+            self.create_timelines(follows, posts)
+            # bulk_create не шлет сигналов, поэтому счетчики и поисковый
+            # индекс строятся здесь
+            rebuild_counters()
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS('База заполнена'))
+
+    def bulk_create(self, model, objects):
+        created = 0
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {created}')
+
+    def text(self, median_length):
+        '''Текст с логнормальным распределением длины'''
+        length = min(
+            int(self.rng.lognormvariate(0, 1) * median_length) + 1, 5000
+        )
+        words = []
+        total = 0
+        while total < length:
+            word = self.rng.choice(WORDS)
+            words.append(word)
+            total += len(word) + 1
+        return ' '.join(words).capitalize()
+
+    def popularity(self, items, alpha):
+        '''Случайный порядок популярности и накопленные веса для него'''
+        ranked = list(items)
+        self.rng.shuffle(ranked)
+        return ranked, zipf_weights(len(ranked), alpha)
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        self.bulk_create(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{i}',
+                first_name=self.rng.choice(WORDS).capitalize(),
+                last_name=f'{USERNAME_PREFIX.capitalize()}{i}',
+                password=password,
+            )
+            for i in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        self.bulk_create(Group, (
+            Group(
+                title=f'Группа {i}',
+                slug=f'{USERNAME_PREFIX}-group-{i}',
+                description=self.text(100),
+            )
+            for i in range(count)
+        ))
+        return list(Group.objects.filter(
+            slug__startswith=f'{USERNAME_PREFIX}-group-'
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_posts(self, count, users, groups, days):
+        authors, weights = self.popularity(users, 1.1)
+        span = dt.timedelta(days=days).total_seconds()
+        rows = (
+            Post(
+                author_id=author_id,
+                group_id=(
+                    self.rng.choice(groups)
+                    if groups and self.rng.random() < 0.7 else None
+                ),
+                text=self.text(200),
+                created=TIMELINE_END - dt.timedelta(
+                    seconds=self.rng.random() * span
+                ),
+            )
+            for author_id in self.rng.choices(
+                authors, cum_weights=weights, k=count
+            )
+        )
+        self.bulk_create(Post, rows)
+        return list(Post.objects.filter(
+            author__username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', 'author_id', 'created'))
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        ranked, weights = self.popularity(posts, 1.2)
+        self.bulk_create(Comment, (
+            Comment(
+                post_id=post_id,
+                author_id=self.rng.choice(users),
+                text=self.text(60),
+                created=created + dt.timedelta(
+                    seconds=self.rng.random() * 7 * 24 * 3600
+                ),
+            )
+            for post_id, _, created in self.rng.choices(
+                ranked, cum_weights=weights, k=count
+            )
+        ))
+
+    def create_follows(self, average, users):
+        '''Граф подписок: на немногих авторов подписано большинство'''
+        authors, weights = self.popularity(users, 1.0)
+        total = weights[-1]
+        follows = set()
+        for user_id in users:
+            wanted = min(
+                int(self.rng.paretovariate(2) * average / 2), len(users) - 1
+            )
+            chosen = set()
+            # перебор ограничен, чтобы не зависнуть на маленьких графах
+            for _ in range(wanted * 3):
+                if len(chosen) >= wanted:
+                    break
+                index = bisect.bisect(weights, self.rng.random() * total)
+                author_id = authors[min(index, len(authors) - 1)]
+                if author_id != user_id:
+                    chosen.add(author_id)
+            follows.update((user_id, author_id) for author_id in chosen)
+        follows = sorted(follows)
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in follows
+        ))
+        return follows
+
+    def create_timelines(self, follows, posts):
+        followers = defaultdict(int)
+        for _, author_id in follows:
+            followers[author_id] += 1
+        latest = defaultdict(list)
+        for post_id, author_id, created in sorted(
+            posts, key=lambda post: (post[2], post[0]), reverse=True
+        ):
+            if len(latest[author_id]) < settings.TIMELINE_BACKFILL_POSTS:
+                latest[author_id].append((post_id, created))
+        self.bulk_create(TimelineEntry, (
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, created=created)
+            for user_id, author_id in follows
+            if followers[author_id] <= settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+            for post_id, created in latest[author_id]
+        ))
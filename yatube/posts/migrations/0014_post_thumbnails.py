@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_detail',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Миниатюра для страницы поста'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_list',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Миниатюра для ленты'),
+        ),
+    ]
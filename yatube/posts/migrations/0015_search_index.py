@@ -0,0 +1,113 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:09
+
+import itertools
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts.stemmer import tokenize
+
+FTS_TABLE = 'posts_search'
+CHUNK_SIZE = 2000
+
+
+def documents(apps, alias):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    yield from (
+        (post_id, None, text) for post_id, text in
+        Post.objects.using(alias).values_list('pk', 'text').iterator()
+    )
+    yield from Comment.objects.using(alias).values_list(
+        'post_id', 'pk', 'text'
+    ).iterator()
+
+
+def fts_rows(chunk):
+    for post_id, comment_id, text in chunk:
+        stems = ' '.join(tokenize(text))
+        if comment_id is None:
+            yield (post_id * 2, stems, '', post_id)
+        else:
+            yield (comment_id * 2 + 1, '', stems, post_id)
+
+
+def search_terms(SearchTerm, chunk):
+    max_length = SearchTerm._meta.get_field('term').max_length
+    for post_id, comment_id, text in chunk:
+        frequencies = Counter(
+            term[:max_length] for term in tokenize(text)
+        )
+        for term, frequency in frequencies.items():
+            yield SearchTerm(
+                term=term,
+                frequency=frequency,
+                post_id=post_id,
+                comment_id=comment_id,
+            )
+
+
+def create_search_index(apps, schema_editor):
+    '''Индекс FTS5 на SQLite, таблица основ на остальных базах'''
+    connection = schema_editor.connection
+    alias = connection.alias
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    fts = connection.vendor == 'sqlite'
+    if fts:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                'USING fts5(post_text, comment_text, post_id UNINDEXED)'
+            )
+    rows = documents(apps, alias)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        if fts:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                    '(rowid, post_text, comment_text, post_id) '
+                    'VALUES (%s, %s, %s, %s)',
+                    list(fts_rows(chunk)),
+                )
+        else:
+            SearchTerm.objects.using(alias).bulk_create(
+                search_terms(SearchTerm, chunk)
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Основа слова в индексе',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
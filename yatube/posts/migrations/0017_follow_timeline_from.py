@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+def set_timeline_from(apps, schema_editor):
+    '''Подпискам, в ленты которых попали не все посты автора, - дату
+    самого старого разложенного поста'''
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    Follow.objects.update(timeline_from=models.Subquery(
+        TimelineEntry.objects.filter(
+            user_id=models.OuterRef('user_id'),
+            author_id=models.OuterRef('author_id'),
+        ).order_by('created').values('created')[:1]
+    ))
+    Follow.objects.exclude(timeline_from=None).annotate(
+        older=models.Exists(Post.objects.filter(
+            author_id=models.OuterRef('author_id'),
+            created__lt=models.OuterRef('timeline_from'),
+        ))
+    ).filter(older=False).update(timeline_from=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timeline_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_from',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Лента разложена с'),
+        ),
+        migrations.RunPython(set_timeline_from, migrations.RunPython.noop),
+    ]
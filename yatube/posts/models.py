@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
-from core.models import CreatedModel
+from core.models import AtomicSaveModel, CreatedModel
 
 User = get_user_model()
 
@@ -10,6 +10,11 @@ class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField('Описание группы')
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -19,6 +24,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        '''Посты для лент: автор и группа одним JOIN, только нужные поля'''
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'created', 'image', 'thumbnail_list',
+            'author_id', 'group_id',
+            'author__username', 'author__first_name', 'author__last_name',
+            'group__title', 'group__slug',
+        )
+
+
 class Post(CreatedModel):
     author = models.ForeignKey(
         User,
@@ -39,11 +55,43 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True,
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    thumbnail_list = models.CharField(
+        'Миниатюра для ленты',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    thumbnail_detail = models.CharField(
+        'Миниатюра для страницы поста',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=['created', 'id'], name='post_created_idx'
+            ),
+            models.Index(
+                fields=['author', 'created', 'id'],
+                name='post_author_created_idx',
+            ),
+            models.Index(
+                fields=['group', 'created', 'id'],
+                name='post_group_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15] + '...'
@@ -67,12 +115,18 @@ class Comment(CreatedModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        )
 
     def __str__(self):
         return self.text[:15] + '...'
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         verbose_name='Подписчик',
@@ -89,6 +143,11 @@ class Follow(models.Model):
         null=True,
         related_name='following'
     )
+    # посты автора не новее этой даты не разложены в ленту подписчика
+    # (TIMELINE_BACKFILL_POSTS) и дочитываются при ее показе
+    timeline_from = models.DateTimeField(
+        'Лента разложена с', blank=True, null=True
+    )
 
     class Meta:
         verbose_name = 'Подписки'
@@ -102,6 +161,117 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_following'
             ),
         )
+        # (user, author) уже проиндексирован ограничением unique_following
+        indexes = (
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.user}->{self.author}'
+
+
+class UserStats(models.Model):
+    '''Счетчики пользователя, поддерживаемые сигналами posts.signals'''
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    '''Пост в материализованной ленте подписок пользователя'''
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    # копия post.created: лента листается по индексу этой таблицы
+    created = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', 'author'], name='timeline_user_author_idx'
+            ),
+            models.Index(
+                fields=['user', '-created', 'post'],
+                name='timeline_user_created_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user}<-{self.post_id}'
+
+
+class SearchTerm(models.Model):
+    '''Основа слова в поисковом индексе для баз без FTS5'''
+    term = models.CharField('Основа слова', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        verbose_name='Комментарий',
+        on_delete=models.CASCADE,
+        related_name='+',
+        blank=True,
+        null=True,
+    )
+    frequency = models.PositiveIntegerField('Число вхождений')
+
+    class Meta:
+        verbose_name = 'Основа слова в индексе'
+        verbose_name_plural = 'Поисковый индекс'
+        indexes = (
+            models.Index(fields=['term', 'post'], name='search_term_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.term}@{self.post_id}'
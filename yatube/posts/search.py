@@ -0,0 +1,271 @@
+import itertools
+import math
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+
+from .models import Comment, Post, SearchTerm
+from .stemmer import tokenize
+
+# что искать: посты вместе с комментариями, только посты
+# или только комментарии
+ALL = 'all'
+POSTS = 'posts'
+COMMENTS = 'comments'
+
+FTS_TABLE = 'posts_search'
+# совпадение в комментарии весит меньше совпадения в самом посте
+COMMENT_WEIGHT = 0.5
+# число документов в индексе таблицы основ
+DOCUMENTS_KEY = 'search-documents:{}'
+
+
+def query_terms(query):
+    '''Основы слов запроса без повторов, в исходном порядке'''
+    terms = dict.fromkeys(tokenize(query))
+    return list(terms)[:settings.SEARCH_MAX_TERMS]
+
+
+def create_fts_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(post_text, comment_text, post_id UNINDEXED)'
+        )
+
+
+def drop_fts_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class FTSBackend:
+    '''Индекс в виртуальной таблице SQLite FTS5.
+    Строка поста - rowid 2*id, строка комментария - 2*id+1'''
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def execute(self, sql, params=()):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def add(self, documents):
+        '''Индексирует документы (post_id, comment_id, text)'''
+        rows = []
+        for post_id, comment_id, text in documents:
+            stems = ' '.join(tokenize(text))
+            if comment_id is None:
+                rows.append((post_id * 2, stems, '', post_id))
+            else:
+                rows.append((comment_id * 2 + 1, '', stems, post_id))
+        with connections[self.alias].cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                '(rowid, post_text, comment_text, post_id) '
+                'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def remove_post(self, post_id):
+        self.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (post_id * 2,)
+        )
+
+    def remove_comment(self, comment_id):
+        self.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (comment_id * 2 + 1,)
+        )
+
+    def clear(self):
+        self.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, terms, kind, limit):
+        match = ' '.join(f'"{term}"' for term in terms)
+        if kind == POSTS:
+            match = f'post_text : ({match})'
+        elif kind == COMMENTS:
+            match = f'comment_text : ({match})'
+        # rank с весами столбцов сортирует строки внутри FTS5
+        rows = (
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rank MATCH %s'
+        )
+        params = (match, f'bm25(1.0, {COMMENT_WEIGHT})', limit)
+        if kind == ALL:
+            # у поста несколько строк, он берется по лучшей из них
+            sql = (
+                f'SELECT post_id FROM (SELECT post_id, rank {rows}) '
+                'GROUP BY post_id ORDER BY MIN(rank), post_id DESC LIMIT %s'
+            )
+        else:
+            column = 'rowid / 2' if kind == COMMENTS else 'post_id'
+            sql = f'SELECT {column} {rows} ORDER BY rank LIMIT %s'
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [object_id for (object_id,) in cursor.fetchall()]
+
+
+class TableBackend:
+    '''Инвертированный индекс в обычной таблице SearchTerm,
+    ранжирование по TF-IDF'''
+
+    max_length = SearchTerm._meta.get_field('term').max_length
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.documents_key = DOCUMENTS_KEY.format(alias)
+        self.entries = SearchTerm.objects.using(alias)
+
+    def add(self, documents):
+        '''Индексирует документы (post_id, comment_id, text)'''
+        entries = []
+        for post_id, comment_id, text in documents:
+            frequencies = Counter(
+                term[:self.max_length] for term in tokenize(text)
+            )
+            entries.extend(
+                SearchTerm(
+                    term=term,
+                    frequency=frequency,
+                    post_id=post_id,
+                    comment_id=comment_id,
+                )
+                for term, frequency in frequencies.items()
+            )
+        self.entries.bulk_create(entries)
+
+    def remove_post(self, post_id):
+        self.entries.filter(post_id=post_id, comment=None).delete()
+
+    def remove_comment(self, comment_id):
+        self.entries.filter(comment_id=comment_id).delete()
+
+    def clear(self):
+        self.entries.all().delete()
+        cache.delete(self.documents_key)
+
+    def documents(self):
+        '''Число документов для IDF. Точное значение тут не нужно, поэтому
+        оно считается заново после перестройки индекса и не чаще раза
+        в SEARCH_DOCUMENTS_TIMEOUT секунд'''
+        documents = cache.get(self.documents_key)
+        if documents is None:
+            documents = (
+                Post.objects.using(self.alias).count()
+                + Comment.objects.using(self.alias).count()
+            )
+            cache.set(
+                self.documents_key, documents,
+                settings.SEARCH_DOCUMENTS_TIMEOUT,
+            )
+        return documents
+
+    def search(self, terms, kind, limit):
+        terms = [term[:self.max_length] for term in terms]
+        entries = self.entries.filter(term__in=terms)
+        if kind == POSTS:
+            entries = entries.filter(comment=None)
+        elif kind == COMMENTS:
+            entries = entries.exclude(comment=None)
+        documents = self.documents()
+        frequencies = dict(entries.values_list('term').annotate(Count('id')))
+        if len(frequencies) < len(terms):
+            return []
+        idf = Case(
+            *(
+                When(term=term, then=Value(
+                    math.log(1 + documents / frequency)
+                ))
+                for term, frequency in frequencies.items()
+            ),
+            output_field=FloatField(),
+        )
+        weight = Case(
+            When(comment=None, then=Value(1.0)),
+            default=Value(COMMENT_WEIGHT),
+            output_field=FloatField(),
+        )
+        # документ - пост или комментарий, в нем должны быть все слова
+        ranked = entries.values('post_id', 'comment_id').annotate(
+            matched=Count('term', distinct=True),
+            score=Sum(
+                F('frequency') * idf * weight, output_field=FloatField()
+            ),
+        ).filter(matched=len(terms)).order_by('-score', '-post_id')
+        if kind != ALL:
+            column = 'comment_id' if kind == COMMENTS else 'post_id'
+            return list(ranked.values_list(column, flat=True)[:limit])
+        # пост берется по лучшему из его документов
+        sql, params = ranked.order_by().query.sql_with_params()
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM ({sql}) GROUP BY post_id '
+                'ORDER BY MAX(score) DESC, post_id DESC LIMIT %s',
+                (*params, limit),
+            )
+            return [post_id for (post_id,) in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def get_backend(alias='default'):
+    '''FTS5 на SQLite, где есть таблица индекса, иначе таблица основ'''
+    connection = connections[alias]
+    if connection.vendor == 'sqlite' and (
+        FTS_TABLE in connection.introspection.table_names()
+    ):
+        return FTSBackend(alias)
+    return TableBackend(alias)
+
+
+def search(query, kind=ALL, limit=None):
+    '''Идентификаторы постов (или комментариев) по убыванию релевантности'''
+    terms = query_terms(query)
+    if not terms:
+        return []
+    return get_backend().search(
+        terms, kind, limit or settings.SEARCH_MAX_RESULTS
+    )
+
+
+def index_post(post):
+    backend = get_backend()
+    backend.remove_post(post.pk)
+    backend.add([(post.pk, None, post.text)])
+
+
+def index_comment(comment):
+    backend = get_backend()
+    backend.remove_comment(comment.pk)
+    backend.add([(comment.post_id, comment.pk, comment.text)])
+
+
+def remove_post(post_id):
+    get_backend().remove_post(post_id)
+
+
+def remove_comment(comment_id):
+    get_backend().remove_comment(comment_id)
+
+
+def rebuild(backend=None, posts=None, comments=None, chunk_size=2000):
+    '''Заново строит индекс по всем постам и комментариям'''
+    backend = backend or get_backend()
+    posts = Post.objects.all() if posts is None else posts
+    comments = Comment.objects.all() if comments is None else comments
+    backend.clear()
+    documents = itertools.chain(
+        (
+            (post_id, None, text)
+            for post_id, text in posts.values_list('pk', 'text').iterator()
+        ),
+        comments.values_list('post_id', 'pk', 'text').iterator(),
+    )
+    while True:
+        chunk = list(itertools.islice(documents, chunk_size))
+        if not chunk:
+            break
+        backend.add(chunk)
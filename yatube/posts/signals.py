@@ -0,0 +1,206 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import feed_cache, follows, images, search, tasks, timelines
+from .counters import change_counter, change_user_counter
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw, **kwargs):
+    '''Запоминает прежние группу и картинку поста,
+    чтобы перенести счетчик и обновить миниатюры'''
+    instance._old_group_id = None
+    instance._old_image = None
+    if instance.pk is not None and not raw:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        change_user_counter(instance.author_id, 'posts_count', 1)
+        change_counter(Group, instance.group_id, 'posts_count', 1)
+    elif instance._old_group_id != instance.group_id:
+        change_counter(Group, instance._old_group_id, 'posts_count', -1)
+        change_counter(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'posts_count', -1)
+    change_counter(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_counter(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_counter(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        change_user_counter(instance.user_id, 'following_count', 1)
+        change_user_counter(instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    # follows.unfollow сдвигает счетчики сам, по числу удаленных строк
+    if follows.counting_deletes():
+        return
+    change_user_counter(instance.user_id, 'following_count', -1)
+    change_user_counter(instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_saved_post(sender, instance, created, raw, **kwargs):
+    '''Ленты немногих подписчиков пополняются сразу, большие
+    рассылки уходят в фоновую задачу'''
+    if not created or raw:
+        return
+    if (timelines.followers_count(instance.author_id)
+            <= settings.TIMELINE_FANOUT_INLINE_FOLLOWERS):
+        timelines.fan_out_post(instance)
+    else:
+        tasks.fan_out_post.delay(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def reset_thumbnails(sender, instance, raw, **kwargs):
+    '''Старые миниатюры не подходят к новой картинке'''
+    if not raw and instance.image.name != instance._old_image:
+        for field in settings.THUMBNAIL_GEOMETRIES:
+            setattr(instance, field, '')
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, created, raw, **kwargs):
+    if raw or not instance.image:
+        return
+    if created or instance.image.name != instance._old_image:
+        # новую загрузку сначала обработать, миниатюры будут после
+        if images.is_processed(instance.image.name):
+            tasks.generate_thumbnails.delay(instance.pk)
+        else:
+            tasks.process_image.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw, **kwargs):
+    if created and not raw and None not in (
+        instance.user_id, instance.author_id
+    ):
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    if None not in (instance.user_id, instance.author_id):
+        timelines.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, raw, **kwargs):
+    '''В том числе после миниатюр: до них ленты показывали
+    исходную картинку'''
+    if raw:
+        return
+    feed_cache.invalidate_post(
+        instance, instance.group_id, instance._old_group_id
+    )
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    feed_cache.invalidate_post(instance, instance.group_id)
+    feed_cache.invalidate((feed_cache.COMMENTS, instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    feed_cache.invalidate((feed_cache.COMMENTS, instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, raw=False, **kwargs):
+    '''Название группы показывается у ее постов во всех лентах'''
+    if raw or instance.pk is None:
+        return
+    authors = Post.objects.filter(
+        group_id=instance.pk
+    ).values_list('author_id', flat=True).distinct()
+    feed_cache.invalidate(
+        (feed_cache.INDEX, None),
+        (feed_cache.GROUP, instance.pk),
+        *((feed_cache.PROFILE, author_id) for author_id in authors),
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, created, raw, update_fields,
+                            **kwargs):
+    '''Имя автора показывается у его постов во всех лентах;
+    вход пользователя (last_login) ленты не меняет'''
+    if created or raw or update_fields == frozenset({'last_login'}):
+        return
+    groups = Post.objects.filter(
+        author_id=instance.pk, group__isnull=False
+    ).values_list('group_id', flat=True).distinct()
+    feed_cache.invalidate(
+        (feed_cache.INDEX, None),
+        (feed_cache.PROFILE, instance.pk),
+        *((feed_cache.GROUP, group_id) for group_id in groups),
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    if instance.user_id is not None:
+        feed_cache.invalidate((feed_cache.FOLLOW, instance.user_id))
+        follows.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw, update_fields, **kwargs):
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, raw, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    search.remove_comment(instance.pk)
@@ -0,0 +1,144 @@
+'''Стеммер Snowball для русского языка
+
+Алгоритм: https://snowballstem.org/algorithms/russian/stemmer.html
+'''
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+        'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+        'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+        'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует',
+        'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я',
+    ),
+)
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _region(word, start):
+    '''Начало области после первой согласной, идущей за гласной'''
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(rv, groups):
+    '''Отрезает самое длинное окончание из группы.
+    Окончания первой группы должны идти после «а» или «я»'''
+    found = None
+    for number, suffixes in enumerate(groups):
+        for suffix in suffixes:
+            if rv.endswith(suffix) and (
+                found is None or len(suffix) > len(found[0])
+            ):
+                found = (suffix, number)
+    if found is None:
+        return None
+    suffix, number = found
+    stem = rv[:-len(suffix)]
+    if number == 0 and not stem.endswith(('а', 'я')):
+        return None
+    return stem
+
+
+def _strip_adjectival(rv):
+    stem = _strip(rv, ADJECTIVE)
+    if stem is None:
+        return None
+    participle = _strip(stem, PARTICIPLE)
+    return stem if participle is None else participle
+
+
+def _strip_endings(rv):
+    '''Шаг 1: окончания деепричастий, прилагательных, глаголов
+    и существительных'''
+    stem = _strip(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    reflexive = _strip(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    for strip in (
+        _strip_adjectival,
+        lambda part: _strip(part, VERB),
+        lambda part: _strip(part, NOUN),
+    ):
+        stem = strip(rv)
+        if stem is not None:
+            return stem
+    return rv
+
+
+def _tidy_up(rv):
+    '''Шаг 4: превосходная степень, удвоенная «н» и мягкий знак'''
+    for suffix in SUPERLATIVE:
+        if rv.endswith(suffix):
+            rv = rv[:-len(suffix)]
+            break
+    if rv.endswith('нн') or rv.endswith('ь'):
+        rv = rv[:-1]
+    return rv
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    '''Основа слова: для русских слов - по Snowball, прочие как есть'''
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2_start = _region(word, _region(word, 0))
+    head, rv = word[:rv_start], word[rv_start:]
+    rv = _strip_endings(rv)
+    # шаг 2: конечная «и»
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    # шаг 3: словообразовательное окончание внутри R2
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and (
+            rv_start + len(rv) - len(suffix) >= r2_start
+        ):
+            rv = rv[:-len(suffix)]
+            break
+    return head + _tidy_up(rv)
+
+
+def tokenize(text):
+    '''Основы всех слов текста'''
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
@@ -0,0 +1,23 @@
+from core.tasks import task
+from . import feed_cache, images, thumbnails, timelines
+from .models import Post
+
+
+@task(priority=10)
+def process_image(post_id):
+    '''Обработка загруженной картинки: автор ждет ее на странице поста'''
+    thumbnails.retry_locked(images.process, post_id)
+
+
+@task(priority=10)
+def generate_thumbnails(post_id):
+    thumbnails.retry_locked(thumbnails.generate, post_id)
+
+
+@task()
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('id', 'author_id').first()
+    if post is not None:
+        timelines.fan_out_post(post)
+        # подписчики могли закэшировать ленту, пока пост раскладывался
+        feed_cache.invalidate((feed_cache.PROFILE, post.author_id))
@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from ..models import Group, Post, User
+
+
+def http_scope(url, method='GET', headers=()):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver'), *headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+def call(app, scope, messages=None):
+    '''Выполняет запрос к ASGI-приложению и возвращает отправленное им'''
+    incoming = list(messages or [{'type': 'http.request', 'body': b''}])
+    sent = []
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    '''Представления выполняются в потоках пула, поэтому данные должны
+    быть видны другим соединениям с базой'''
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='auth', password='secret'
+        )
+        self.group = Group.objects.create(
+            title='Test group', slug='test-slug', description='Description'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Текст поста'
+        )
+        self.app = ASGIHandler(threads=2)
+
+    def tearDown(self):
+        self.app.executor.shutdown()
+
+    def test_page_is_served(self):
+        '''Страница отдается целиком с заголовками ответа Django'''
+        start, body = call(self.app, http_scope(
+            reverse('posts:posts_group', kwargs={'slug': 'test-slug'})
+        ))
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/html; charset=utf-8'), start['headers']
+        )
+        self.assertIn('Текст поста', body['body'].decode())
+        self.assertFalse(body.get('more_body', False))
+
+    def test_session_cookie_and_redirect(self):
+        '''Сессия из cookie работает, редиректы отдают Location'''
+        url = reverse('posts:follow_index')
+        start, _ = call(self.app, http_scope(url))
+        self.assertEqual(start['status'], 302)
+        self.assertIn(b'location', dict(start['headers']))
+        client = Client()
+        client.force_login(self.author)
+        cookie = client.cookies['sessionid']
+        start, _ = call(self.app, http_scope(url, headers=[
+            (b'cookie', f'sessionid={cookie.value}'.encode()),
+        ]))
+        self.assertEqual(start['status'], 200)
+
+    def test_repeated_cookie_headers(self):
+        '''Несколько заголовков Cookie читаются как один'''
+        client = Client()
+        client.force_login(self.author)
+        cookie = client.cookies['sessionid']
+        start, _ = call(self.app, http_scope(
+            reverse('posts:follow_index'), headers=[
+                (b'cookie', b'theme=dark'),
+                (b'cookie', f'sessionid={cookie.value}'.encode()),
+            ],
+        ))
+        self.assertEqual(start['status'], 200)
+
+    def test_streaming_response_is_sent_in_chunks(self):
+        '''Потоковый ответ уходит частями по мере чтения из базы'''
+        sent = call(self.app, http_scope(reverse('api:post_list')))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertTrue(sent[1]['more_body'])
+        self.assertFalse(sent[-1].get('more_body', False))
+        data = json.loads(b''.join(message.get('body', b'')
+                                   for message in sent[1:]))
+        self.assertEqual(data['results'][0]['text'], 'Текст поста')
+
+    def test_request_body_in_parts(self):
+        '''Тело без Content-Length, пришедшее частями, читается целиком'''
+        credentials = base64.b64encode(b'auth:secret').decode()
+        body = json.dumps({'text': 'Через ASGI'}).encode()
+        start, response = call(self.app, http_scope(
+            reverse('api:post_list'), 'POST', headers=[
+                (b'authorization', f'Basic {credentials}'.encode()),
+                (b'content-type', b'application/json'),
+            ]
+        ), [
+            {'type': 'http.request', 'body': body[:5], 'more_body': True},
+            {'type': 'http.request', 'body': body[5:]},
+        ])
+        self.assertEqual(start['status'], 201)
+        self.assertEqual(json.loads(response['body'])['text'], 'Через ASGI')
+
+    def test_disconnect_before_body(self):
+        '''Отключившийся клиент не доходит до представления'''
+        self.assertEqual(call(self.app, http_scope(
+            reverse('api:post_list'), 'POST'
+        ), [{'type': 'http.disconnect'}]), [])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_lifespan(self):
+        sent = call(self.app, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ])
+        self.assertEqual([message['type'] for message in sent], [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete',
+        ])
+
+    def test_benchmark_command(self):
+        '''Нагрузочный замер отдает метрики обоих серверов'''
+        output = StringIO()
+        call_command(
+            'benchmark_asgi', clients=3, requests=2, delay=0, threads=2,
+            stdout=output,
+        )
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['requests'], 6)
+        for server in ('wsgi', 'asgi'):
+            with self.subTest(server=server):
+                self.assertEqual(report[server]['statuses'], {'200': 6})
+                self.assertGreater(report[server]['throughput_rps'], 0)
@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..benchmarks.views import percentile, regressions
+from ..models import Comment, Follow, Group, Post, User
+
+
+class BenchmarkViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        post = Post.objects.create(author=author, group=group, text='Text')
+        Comment.objects.create(author=reader, post=post, text='Comment')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        handle, self.output = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.output)
+
+    def test_report_has_every_hot_view(self):
+        '''Отчет содержит метрики всех горячих страниц'''
+        call_command(
+            'benchmark_views', requests=2, output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output) as file:
+            report = json.load(file)
+        self.assertEqual(report['meta']['dataset']['posts'], 1)
+        for name in ('index', 'group_posts', 'profile', 'post_detail',
+                     'follow_index'):
+            with self.subTest(name=name):
+                result = report['views'][name]
+                self.assertEqual(result['status'], 200)
+                for metric in ('p50_ms', 'p95_ms', 'queries', 'rows'):
+                    self.assertIn(metric, result)
+                self.assertGreater(result['queries'], 0)
+
+    def test_compare_fails_on_regression(self):
+        '''Сравнение с лучшим прогоном сообщает о регрессии'''
+        call_command(
+            'benchmark_views', requests=2, output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output) as file:
+            report = json.load(file)
+        report['views']['index']['queries'] -= 1
+        with open(self.output, 'w') as file:
+            json.dump(report, file)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_views', requests=2, compare=self.output,
+                threshold=1000, stdout=StringIO(),
+            )
+
+    def test_percentile_and_regressions(self):
+        '''Перцентили и поиск регрессий считаются верно'''
+        self.assertEqual(percentile(range(1, 101), 50), 50)
+        self.assertEqual(percentile(range(1, 101), 95), 95)
+        baseline = {'index': {'p50_ms': 10, 'queries': 3, 'rows': 10}}
+        self.assertEqual(regressions(
+            {'index': {'p50_ms': 11, 'queries': 3, 'rows': 10}},
+            baseline, 1.2
+        ), {})
+        self.assertEqual(regressions(
+            {'index': {'p50_ms': 13, 'queries': 4, 'rows': 10}},
+            baseline, 1.2
+        ), {'index': {'p50_ms': (10, 13), 'queries': (3, 4)}})
+
+
+class BenchmarkFollowsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(3)
+        ]
+        Follow.objects.create(user=cls.users[0], author=cls.users[1])
+
+    def test_report_and_restored_follows(self):
+        '''Замер не ломает инварианты и возвращает подписки на место'''
+        output = StringIO()
+        call_command(
+            'benchmark_follows', threads=1, requests=30, stdout=output,
+        )
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['requests'], 30)
+        self.assertEqual(report['statuses'], {'302': 30})
+        self.assertEqual(report['duplicates'], 0)
+        self.assertEqual(report['stale_counters'], [])
+        self.assertEqual(list(Follow.objects.values_list(
+            'user', 'author'
+        )), [(self.users[0].pk, self.users[1].pk)])
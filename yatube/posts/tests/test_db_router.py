@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import db_router
+from ..models import Group, Post, User
+
+REPLICA = 'replica0'
+
+
+class ReplicaRouterTests(TestCase):
+    def read_alias(self, sticky=False, write=False):
+        @db_router.replica_reads
+        def view(request):
+            if write:
+                router.db_for_write(Post)
+            return router.db_for_read(Post)
+
+        with db_router.routing(sticky):
+            return view(None)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_reads_are_routed_to_replica(self):
+        '''Помеченные представления читают с реплики'''
+        self.assertEqual(self.read_alias(), REPLICA)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_sessions_that_wrote_read_primary(self):
+        '''После записи чтения идут на primary'''
+        self.assertEqual(self.read_alias(sticky=True), db_router.PRIMARY)
+        self.assertEqual(self.read_alias(write=True), db_router.PRIMARY)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA])
+    def test_unmarked_code_reads_primary(self):
+        with db_router.routing():
+            self.assertEqual(router.db_for_read(Post), db_router.PRIMARY)
+        self.assertEqual(router.db_for_read(Post), db_router.PRIMARY)
+
+    def test_write_sets_sticky_cookie(self):
+        '''Запрос с записью ставит cookie, обычное чтение - нет'''
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Text')
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse('posts:posts_main'))
+        self.assertNotIn(db_router.STICKY_COOKIE, response.cookies)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Comment'},
+        )
+        self.assertIn(db_router.STICKY_COOKIE, response.cookies)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaFileTests(TestCase):
+    '''Реплика - отдельный файл sqlite, в котором есть только ее пост'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': cls.replica_path,
+        }
+        connections.ensure_defaults(REPLICA)
+        connections.prepare_test_settings(REPLICA)
+        with connections[REPLICA].schema_editor() as editor:
+            for model in (User, Group, Post):
+                editor.create_model(model)
+        # bulk_create не шлет сигналов, которые писали бы в primary
+        User.objects.using(REPLICA).bulk_create([
+            User(username='replica-author'),
+        ])
+        Post.objects.using(REPLICA).bulk_create([
+            Post(author_id=1, text='Пост только на реплике'),
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        os.remove(cls.replica_path)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_is_read_from_replica_until_session_writes(self):
+        url = reverse('posts:posts_main')
+        response = self.client.get(url)
+        self.assertContains(response, 'Пост только на реплике')
+        self.client.cookies[db_router.STICKY_COOKIE] = '1'
+        cache.clear()
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Пост только на реплике')
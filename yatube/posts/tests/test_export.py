@@ -0,0 +1,209 @@
+import csv
+import datetime as dt
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.admin import helpers
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author if i % 2 else cls.reader,
+                group=cls.group if i < 3 else None,
+                text=f'Текст, "с кавычками"\nи переносом {i}',
+            )
+            for i in range(6)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(
+            created=timezone.now() - dt.timedelta(days=10)
+        )
+        Comment.objects.create(
+            author=cls.reader, post=cls.posts[1], text='Comment'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, **options):
+        stdout = StringIO()
+        call_command('export_posts', stdout=stdout, stderr=StringIO(),
+                     **options)
+        return stdout.getvalue()
+
+    def test_ndjson_posts(self):
+        '''Посты выгружаются построчным JSON по возрастанию id'''
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts]
+        )
+        self.assertEqual(rows[1]['author'], 'auth')
+        self.assertEqual(rows[1]['group'], 'test-slug')
+        self.assertEqual(rows[1]['text'], self.posts[1].text)
+
+    def test_csv_comments_and_follows(self):
+        '''Комментарии и подписки выгружаются в CSV с заголовком'''
+        rows = list(csv.reader(StringIO(
+            self.export(kind='comments', format='csv')
+        )))
+        self.assertEqual(rows[0], ['id', 'created', 'post', 'author', 'text'])
+        self.assertEqual(rows[1][2:], [
+            str(self.posts[1].pk), 'reader', 'Comment'
+        ])
+        rows = list(csv.reader(StringIO(
+            self.export(kind='follows', format='csv')
+        )))
+        self.assertEqual(rows[1][1:], ['reader', 'auth'])
+
+    def test_filters(self):
+        '''Выгрузка фильтруется по автору, группе и датам'''
+        today = timezone.localdate()
+        cases = (
+            ({'author': 'auth'}, [1, 3, 5]),
+            ({'group': 'test-slug'}, [0, 1, 2]),
+            ({'since': today}, [1, 2, 3, 4, 5]),
+            ({'until': today - dt.timedelta(days=5)}, [0]),
+            ({'author': 'auth', 'group': 'test-slug'}, [1]),
+            ({'after_id': self.posts[3].pk}, [4, 5]),
+        )
+        for options, indexes in cases:
+            with self.subTest(options=options):
+                rows = [
+                    json.loads(line)['id']
+                    for line in self.export(**options).splitlines()
+                ]
+                self.assertEqual(
+                    rows, [self.posts[index].pk for index in indexes]
+                )
+        with self.assertRaises(CommandError):
+            self.export(kind='follows', group='test-slug')
+
+    def test_gzip_output_and_resume(self):
+        '''Сжатая выгрузка дописывается с места остановки'''
+        path = os.path.join(self.directory, 'posts.ndjson.gz')
+        self.export(output=path, chunk_size=2)
+        with gzip.open(path, 'rt') as file:
+            full = file.read()
+        with gzip.open(path, 'wt') as file:
+            file.writelines(full.splitlines(keepends=True)[:2])
+        self.export(output=path, resume=True)
+        with gzip.open(path, 'rt') as file:
+            self.assertEqual(file.read(), full)
+
+    def test_csv_resume_skips_header(self):
+        '''Дозапись CSV не повторяет заголовок и строки'''
+        path = os.path.join(self.directory, 'posts.csv')
+        self.export(output=path, format='csv')
+        with open(path, newline='') as file:
+            full = list(csv.reader(file))
+        with open(path, 'w', newline='') as file:
+            csv.writer(file).writerows(full[:3])
+        self.export(output=path, format='csv', resume=True)
+        with open(path, newline='') as file:
+            self.assertEqual(list(csv.reader(file)), full)
+
+    def cut(self, path, size):
+        '''Обрезает файл до size байт, как прерванная выгрузка'''
+        with open(path, 'rb') as file:
+            data = file.read()
+        with open(path, 'wb') as file:
+            file.write(data[:size])
+        return data
+
+    def test_resume_interrupted_gzip(self):
+        '''Сжатая выгрузка без конца потока дописывается без повторов'''
+        path = os.path.join(self.directory, 'posts.ndjson.gz')
+        self.export(output=path)
+        with gzip.open(path, 'rt') as file:
+            full = file.read()
+        size = os.path.getsize(path)
+        for cut in (size - 4, size // 2):
+            with self.subTest(cut=cut):
+                self.cut(path, cut)
+                self.export(output=path, resume=True)
+                with gzip.open(path, 'rt') as file:
+                    self.assertEqual(file.read(), full)
+
+    def test_resume_cut_plain_ndjson(self):
+        '''Оборванная посреди символа или строки выгрузка
+        дописывается с последней целой записи'''
+        path = os.path.join(self.directory, 'posts.ndjson')
+        self.export(output=path)
+        with open(path, 'rb') as file:
+            full = file.read()
+        second_line = full.index(b'\n') + 1
+        # «Т» занимает два байта: обрыв между ними ломает UTF-8
+        cuts = {
+            'mid-character': full.index('Т'.encode(), second_line) + 1,
+            'mid-line': second_line + 10,
+        }
+        for name, size in cuts.items():
+            with self.subTest(cut=name):
+                self.cut(path, size)
+                self.export(output=path, resume=True)
+                with open(path, 'rb') as file:
+                    self.assertEqual(file.read(), full)
+
+    def test_resume_csv_cut_inside_quotes(self):
+        '''CSV, оборванный внутри многострочного текста, дописывается
+        без обрывка записи'''
+        path = os.path.join(self.directory, 'posts.csv')
+        self.export(output=path, format='csv')
+        with open(path, 'rb') as file:
+            full = file.read()
+        self.cut(path, full.index('переносом 2'.encode()))
+        self.export(output=path, format='csv', resume=True)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), full)
+        self.cut(path, 3)
+        self.export(output=path, format='csv', resume=True)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), full)
+
+    def test_admin_action(self):
+        '''Действие админки отдает выбранные посты файлом'''
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'export_ndjson',
+            helpers.ACTION_CHECKBOX_NAME: [
+                self.posts[0].pk, self.posts[2].pk
+            ],
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [self.posts[0].pk, self.posts[2].pk],
+        )
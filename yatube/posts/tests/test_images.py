@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def picture(name, size=(40, 30), color=(200, 10, 10), exif=None):
+    output = BytesIO()
+    kwargs = {'exif': exif} if exif is not None else {}
+    Image.new('RGB', size, color).save(output, 'JPEG', **kwargs)
+    return SimpleUploadedFile(
+        name=name, content=output.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=20)
+class ImagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(ImagesTests.author)
+
+    def create(self, image):
+        return Post.objects.create(
+            author=ImagesTests.author, text='Картинка', image=image
+        )
+
+    def test_image_is_resized_and_reencoded(self):
+        '''Картинка уменьшается и пережимается без метаданных'''
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        post = self.create(picture('photo.jpg', exif=exif.tobytes()))
+        original = post.image.name
+        images.process(post.pk)
+        post.refresh_from_db()
+        self.assertTrue(images.is_processed(post.image.name))
+        self.assertFalse(default_storage.exists(original))
+        self.assertTrue(post.thumbnail_list)
+        with Image.open(post.image) as image:
+            self.assertEqual(image.format, settings.IMAGE_FORMAT)
+            self.assertEqual(max(image.size), 20)
+            self.assertFalse(image.getexif())
+
+    def test_identical_uploads_are_stored_once(self):
+        '''Одинаковые загрузки хранятся одним файлом'''
+        first = self.create(picture('first.jpg'))
+        second = self.create(picture('second.jpg'))
+        other = self.create(picture('other.jpg', color=(0, 0, 255)))
+        for post in (first, second, other):
+            images.process(post.pk)
+            post.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+
+    def test_publish_keeps_existing_file(self):
+        '''Параллельная обработка не перезаписывает готовый файл'''
+        name = images.processed_name('0' * 64)
+        self.assertEqual(
+            images.publish(default_storage, name, b'first'), name
+        )
+        self.assertEqual(
+            images.publish(default_storage, name, b'second'), name
+        )
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), b'first')
+        directory = os.path.dirname(default_storage.path(name))
+        self.assertFalse([
+            file for file in os.listdir(directory) if file.startswith('tmp')
+        ])
+
+    def test_process_images_command(self):
+        '''Команда process_images обрабатывает старые загрузки'''
+        post = self.create(picture('old.jpg'))
+        call_command('process_images', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(images.is_processed(post.image.name))
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_too_large_file_is_rejected(self):
+        '''Форма не принимает файл больше IMAGE_UPLOAD_MAX_SIZE'''
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Большой файл', 'image': picture('large.jpg'),
+        })
+        self.assertFormError(
+            response, 'form', 'image',
+            'Файл слишком большой, допустимо не больше 100\xa0байт'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100)
+    def test_too_many_pixels_are_rejected(self):
+        '''Форма не принимает картинку больше IMAGE_UPLOAD_MAX_PIXELS'''
+        response = self.client.post(reverse('posts:post_create'), {
+            'text': 'Большая картинка', 'image': picture('huge.jpg'),
+        })
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое разрешение изображения'
+        )
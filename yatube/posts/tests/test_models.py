@@ -1,6 +1,10 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import models
 from django.test import TestCase
 
-from ..models import Comment, Follow, Group, Post, User
+from ..models import Comment, Follow, Group, Post, User, UserStats
 
 
 class PostModelTest(TestCase):
@@ -42,3 +46,155 @@ class PostModelTest(TestCase):
         for model, expected_model_name in model_str.items():
             with self.subTest(model=model):
                 self.assertEqual(expected_model_name, str(model))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счетчики."""
+        user, group = CountersTest.user, CountersTest.group
+        other_group = CountersTest.other_group
+        post = Post.objects.create(author=user, group=group, text='Текст')
+        self.refresh(user.stats, group)
+        self.assertEqual(user.stats.posts_count, 1)
+        self.assertEqual(group.posts_count, 1)
+        post.group = other_group
+        post.save()
+        self.refresh(group, other_group)
+        self.assertEqual(group.posts_count, 0)
+        self.assertEqual(other_group.posts_count, 1)
+        post.delete()
+        self.refresh(user.stats, other_group)
+        self.assertEqual(user.stats.posts_count, 0)
+        self.assertEqual(other_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии учитываются в счетчике поста."""
+        post = Post.objects.create(author=CountersTest.user, text='Текст')
+        comment = Comment.objects.create(
+            author=CountersTest.follower, post=post, text='Комментарий'
+        )
+        self.refresh(post)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        self.refresh(post)
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счетчики подписчиков и подписок."""
+        user, follower = CountersTest.user, CountersTest.follower
+        follow = Follow.objects.create(user=follower, author=user)
+        self.refresh(user.stats, follower.stats)
+        self.assertEqual(user.stats.followers_count, 1)
+        self.assertEqual(follower.stats.following_count, 1)
+        follow.delete()
+        self.refresh(user.stats, follower.stats)
+        self.assertEqual(user.stats.followers_count, 0)
+        self.assertEqual(follower.stats.following_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет разъехавшиеся счетчики."""
+        user, group = CountersTest.user, CountersTest.group
+        post = Post.objects.create(author=user, group=group, text='Текст')
+        Comment.objects.create(author=user, post=post, text='Комментарий')
+        Follow.objects.create(user=CountersTest.follower, author=user)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=7)
+        UserStats.objects.filter(user=CountersTest.follower).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.refresh(user.stats, group, post)
+        follower_stats = UserStats.objects.get(user=CountersTest.follower)
+        self.assertEqual(user.stats.posts_count, 1)
+        self.assertEqual(user.stats.followers_count, 1)
+        self.assertEqual(user.stats.following_count, 0)
+        self.assertEqual(follower_stats.following_count, 1)
+        self.assertEqual(group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+
+class ExplainFeedsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = User.objects.create_user(username='auth')
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=user)
+        post = Post.objects.create(author=user, text='Тестовый текст')
+        Comment.objects.create(author=follower, post=post, text='Текст')
+
+    def test_explain_feeds_prints_every_hot_query(self):
+        """Команда explain_feeds печатает план каждого горячего запроса."""
+        out = StringIO()
+        call_command('explain_feeds', repeat=1, stdout=out)
+        for name in ('index', 'group_posts', 'profile', 'follow_index',
+                     'post_detail comments', 'followers of author'):
+            with self.subTest(name=name):
+                self.assertIn(name, out.getvalue())
+
+
+class SeedYatubeCommandTest(TestCase):
+    options = {
+        'users': 30,
+        'groups': 3,
+        'posts': 200,
+        'comments': 300,
+        'follows': 5,
+        'seed': 7,
+        'stdout': StringIO(),
+    }
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('created').values_list(
+                'author__username', 'group__slug', 'text', 'created'
+            )),
+            sorted(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_seed_creates_requested_amounts(self):
+        """Команда seed_yatube создает заданное количество объектов."""
+        call_command('seed_yatube', **self.options)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(
+            user=models.F('author')
+        ).exists())
+        author = Post.objects.first().author
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+
+    def test_seed_is_deterministic(self):
+        """Одинаковый seed дает одинаковые данные."""
+        call_command('seed_yatube', **self.options)
+        first = self.snapshot()
+        Follow.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        call_command('seed_yatube', **self.options)
+        self.assertEqual(self.snapshot(), first)
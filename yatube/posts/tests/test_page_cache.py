@@ -0,0 +1,195 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import db_router
+from core.middleware import SharedPageCacheMiddleware
+from ..models import Comment, Follow, Group, Post, User
+
+
+class SharedPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        cls.other_group = Group.objects.create(
+            title='Other group',
+            slug='other-slug',
+            description='Other description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Test text'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:posts_main'),
+            'group': reverse(
+                'posts:posts_group', kwargs={'slug': 'test-slug'}
+            ),
+            'other_group': reverse(
+                'posts:posts_group', kwargs={'slug': 'other-slug'}
+            ),
+            'profile': reverse('posts:profile', kwargs={'username': 'auth'}),
+            'other_profile': reverse(
+                'posts:profile', kwargs={'username': 'other'}
+            ),
+            'detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+        }
+
+    def is_cached(self, url, client=None):
+        '''Ответ отдан из кэша: шаблон страницы не рисовался'''
+        response = (client or self.guest_client).get(url)
+        return 'base.html' not in [
+            template.name for template in response.templates
+        ]
+
+    def warm(self):
+        for url in self.urls.values():
+            self.guest_client.get(url)
+
+    def test_anonymous_pages_are_cached(self):
+        '''Повторный запрос анонима не вызывает представление'''
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertFalse(self.is_cached(url))
+                self.assertTrue(self.is_cached(url))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.urls['index'])
+        self.assertContains(response, 'Test text')
+        self.assertFalse(self.is_cached(self.urls['index'] + '?cursor=x'))
+
+    def test_cached_page_answers_not_modified(self):
+        '''Кэшированная страница отвечает 304 по ETag'''
+        response = self.guest_client.get(self.urls['index'])
+        response = self.guest_client.get(
+            self.urls['index'], HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_users_share_cached_pages(self):
+        '''Вошедшие получают общую часть из кэша со своими фрагментами'''
+        self.warm()
+        Follow.objects.create(
+            user=SharedPageCacheTests.other, author=SharedPageCacheTests.author
+        )
+        client = Client()
+        client.force_login(SharedPageCacheTests.other)
+        for name in ('index', 'group', 'profile', 'detail'):
+            with self.subTest(page=name):
+                self.assertTrue(self.is_cached(self.urls[name], client))
+        response = client.get(self.urls['profile'])
+        self.assertContains(response, 'Пользователь: other')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Войти')
+        response = client.get(self.urls['detail'])
+        self.assertContains(response, 'отписаться от автора')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.guest_client.get(self.urls['detail'])
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_page_rendered_for_user_is_shared_with_anonymous(self):
+        '''В кэш не попадает ничего от зрителя, нарисовавшего страницу'''
+        client = Client()
+        client.force_login(SharedPageCacheTests.author)
+        client.get(self.urls['detail'])
+        self.assertTrue(self.is_cached(self.urls['detail']))
+        response = self.guest_client.get(self.urls['detail'])
+        self.assertNotContains(response, 'Пользователь:')
+        self.assertNotContains(response, 'Редактировать пост')
+        self.assertContains(
+            client.get(self.urls['detail']), 'Редактировать пост'
+        )
+
+    def test_sticky_requests_bypass_cache(self):
+        '''Сессии, которые только что писали, идут мимо кэша'''
+        self.warm()
+        sticky_client = Client()
+        sticky_client.cookies[db_router.STICKY_COOKIE] = '1'
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertFalse(self.is_cached(url, sticky_client))
+
+    def test_post_change_purges_its_pages(self):
+        '''Правка поста сбрасывает только страницы, где он показан'''
+        self.warm()
+        self.post.text = 'Changed text'
+        self.post.save()
+        for name in ('index', 'group', 'profile', 'detail'):
+            with self.subTest(page=name):
+                response = self.guest_client.get(self.urls[name])
+                self.assertIsNotNone(response.context)
+                self.assertContains(response, 'Changed text')
+        for name in ('other_group', 'other_profile'):
+            with self.subTest(page=name):
+                self.assertTrue(self.is_cached(self.urls[name]))
+
+    def test_comment_purges_post_page(self):
+        '''Новый комментарий сбрасывает страницу поста'''
+        self.warm()
+        Comment.objects.create(
+            author=SharedPageCacheTests.other, post=self.post,
+            text='Fresh comment',
+        )
+        self.assertContains(
+            self.guest_client.get(self.urls['detail']), 'Fresh comment'
+        )
+        self.assertTrue(self.is_cached(self.urls['index']))
+
+    def test_group_change_purges_pages_with_its_posts(self):
+        '''Переименование группы сбрасывает ленты с ее постами'''
+        self.warm()
+        group = SharedPageCacheTests.group
+        group.title = 'Renamed group'
+        group.save()
+        for name in ('index', 'group', 'profile'):
+            with self.subTest(page=name):
+                self.assertContains(
+                    self.guest_client.get(self.urls[name]), 'Renamed group'
+                )
+        for name in ('other_group', 'other_profile'):
+            with self.subTest(page=name):
+                self.assertTrue(self.is_cached(self.urls[name]))
+
+    def test_responses_with_cookies_are_not_cached(self):
+        '''Ответы с cookie или запретом кэширования не сохраняются'''
+        self.assertTrue(SharedPageCacheMiddleware.cacheable(HttpResponse()))
+        with_cookie = HttpResponse()
+        with_cookie.set_cookie('name', 'value')
+        private = HttpResponse()
+        private['Cache-Control'] = 'private'
+        for response in (with_cookie, private, HttpResponse(status=404)):
+            with self.subTest(response=response):
+                self.assertFalse(
+                    SharedPageCacheMiddleware.cacheable(response)
+                )
+
+    def test_fragments_render_inline_without_assembly(self):
+        '''Без сборки фрагменты рисуются прямо в шаблоне'''
+        middleware = [
+            name for name in settings.MIDDLEWARE
+            if name not in (
+                'core.middleware.PersonalFragmentsMiddleware',
+                'core.middleware.SharedPageCacheMiddleware',
+            )
+        ]
+        client = Client()
+        client.force_login(SharedPageCacheTests.author)
+        with override_settings(MIDDLEWARE=middleware):
+            response = client.get(self.urls['detail'])
+        self.assertContains(response, 'Пользователь: auth')
+        self.assertContains(response, 'Редактировать пост')
+        self.assertNotContains(response, '<!--personal:')
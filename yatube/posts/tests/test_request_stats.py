@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import request_stats
+from ..models import Post, User
+
+
+class RequestStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.author, text='Text')
+        cls.admin = User.objects.create_user(
+            username='admin', is_staff=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        request_stats.reset()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        '''Ответ сообщает время SQL, шаблонов и работу кэша'''
+        response = self.guest_client.get(reverse('posts:posts_main'))
+        timing = response['Server-Timing']
+        for metric in ('sql;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    def test_stats_are_grouped_by_view_name(self):
+        '''Статистика копится по имени представления'''
+        url = reverse('posts:posts_main')
+        self.guest_client.get(url)
+        [first] = request_stats.summary()
+        self.guest_client.get(url)
+        rows = {row['view_name']: row for row in request_stats.summary()}
+        index = rows['posts:posts_main']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['queries'], 0)
+        self.assertGreater(index['template_ms'], 0)
+        # второй запрос берет ленту из кэша фрагментов
+        self.assertGreater(
+            index['cache_hit_ratio'], first['cache_hit_ratio']
+        )
+
+    def test_stats_page_is_for_staff_only(self):
+        '''Страница статистики открыта только сотрудникам'''
+        url = reverse('request_stats')
+        self.guest_client.get(reverse('posts:posts_main'))
+        response = self.guest_client.get(url)
+        self.assertRedirects(
+            response, f'{reverse("admin:login")}?next={url}'
+        )
+        staff_client = Client()
+        staff_client.force_login(RequestStatsTests.admin)
+        response = staff_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'posts:posts_main')
@@ -0,0 +1,139 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, User
+from ..stemmer import stem
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        '''Разные формы слова сводятся к одной основе'''
+        forms = (
+            ('книга', 'книги', 'книгами'),
+            ('красивая', 'красивый', 'красивейший'),
+            ('Ёлка', 'елки'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({stem(word) for word in words}), 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.about_cats = Post.objects.create(
+            author=cls.author, text='Коты спят на старых книгах'
+        )
+        cls.about_dogs = Post.objects.create(
+            author=cls.author, text='Собаки гуляют в парке'
+        )
+        cls.comment = Comment.objects.create(
+            author=cls.author,
+            post=cls.about_dogs,
+            text='А мой кот боится собак',
+        )
+
+    def backends(self):
+        table = search.TableBackend('default')
+        search.rebuild(table)
+        return (search.get_backend(), table)
+
+    def test_default_backend_on_sqlite_is_fts(self):
+        self.assertIsInstance(search.get_backend(), search.FTSBackend)
+
+    def test_search_finds_word_forms_in_posts_and_comments(self):
+        '''Поиск находит формы слова, посты выше комментариев'''
+        terms = search.query_terms('коты')
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(
+                    backend.search(terms, search.ALL, 10),
+                    [SearchTests.about_cats.pk, SearchTests.about_dogs.pk],
+                )
+                self.assertEqual(
+                    backend.search(terms, search.POSTS, 10),
+                    [SearchTests.about_cats.pk],
+                )
+                self.assertEqual(
+                    backend.search(terms, search.COMMENTS, 10),
+                    [SearchTests.comment.pk],
+                )
+
+    def test_all_words_are_required(self):
+        '''Документ должен содержать все слова запроса'''
+        terms = search.query_terms('собака парк')
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(
+                    backend.search(terms, search.ALL, 10),
+                    [SearchTests.about_dogs.pk],
+                )
+
+    def test_limit_applies_to_posts(self):
+        '''Лимит считает посты, а не строки индекса'''
+        Comment.objects.create(
+            author=SearchTests.author,
+            post=SearchTests.about_cats,
+            text='Кот снова спит',
+        )
+        terms = search.query_terms('кот')
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(
+                    backend.search(terms, search.ALL, 1),
+                    [SearchTests.about_cats.pk],
+                )
+
+    def test_table_backend_counts_documents_once(self):
+        '''Число документов не пересчитывается на каждый запрос'''
+        table = self.backends()[1]
+        terms = search.query_terms('кот')
+        table.search(terms, search.ALL, 10)
+        with CaptureQueriesContext(connection) as queries:
+            table.search(terms, search.ALL, 10)
+        self.assertFalse(any(
+            'COUNT(*)' in query['sql'] for query in queries
+        ))
+
+    def test_index_follows_changes(self):
+        '''Индекс обновляется при правке и удалении'''
+        post = Post.objects.create(author=SearchTests.author, text='Дракон')
+        self.assertEqual(search.search('драконы'), [post.pk])
+        post.text = 'Единорог'
+        post.save()
+        self.assertEqual(search.search('дракон'), [])
+        self.assertEqual(search.search('единороги'), [post.pk])
+        post.delete()
+        self.assertEqual(search.search('единорог'), [])
+        Comment.objects.get(pk=SearchTests.comment.pk).delete()
+        self.assertEqual(search.search('боится'), [])
+
+    def test_search_page(self):
+        '''Страница поиска показывает найденные посты'''
+        response = Client().get(
+            reverse('posts:post_search'), {'q': 'собаки'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [SearchTests.about_dogs],
+        )
+
+    def test_admin_search_uses_index(self):
+        '''Поиск в админке идет по индексу'''
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'книга'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [SearchTests.about_cats],
+        )
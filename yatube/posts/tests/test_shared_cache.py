@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache, get_or_compute
+
+
+def try_add(path):
+    return SQLiteCache(path, {}).add('lock', os.getpid(), 60)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.cache = SQLiteCache(self.path, {})
+
+    def tearDown(self):
+        self.cache.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.cache.delete_many(['a', 'key'])
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_many(['a', 'b']), {'b': 2})
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_expired_entries_are_missing(self):
+        self.cache.set('key', 'value', 0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new', 60))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_cache_is_shared_between_instances(self):
+        '''Два экземпляра на одном файле видят общие данные'''
+        SQLiteCache(self.path, {}).set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_add_is_atomic_across_processes(self):
+        '''Только один процесс получает блокировку'''
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(4) as pool:
+            results = pool.map(try_add, [self.path] * 8)
+        self.assertEqual(results.count(True), 1)
+
+    def test_cull_keeps_max_entries(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        for i in range(30):
+            cache.set(f'key{i}', i)
+        [count] = cache.connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()
+        self.assertLessEqual(count, 10)
+        self.assertEqual(cache.get('key29'), 29)
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.cache = SQLiteCache(self.path, {})
+        self.calls = 0
+
+    def tearDown(self):
+        self.cache.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return 'value'
+
+    def test_concurrent_misses_compute_once(self):
+        '''Одновременные промахи считают значение один раз'''
+        results = []
+
+        def read():
+            results.append(get_or_compute(
+                'key', self.compute, 60, cache=self.cache
+            ))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_expiring_value_is_refreshed_early(self):
+        '''Значение на исходе срока обновляется до истечения'''
+        self.cache.set('key', ('old', 1.0, time.time() + 5), 60)
+        value = get_or_compute(
+            'key', self.compute, 60, cache=self.cache, beta=10 ** 6
+        )
+        self.assertEqual((value, self.calls), ('value', 1))
+
+    def test_stale_value_is_served_while_another_computes(self):
+        '''Пока другой процесс считает, отдается старое значение'''
+        self.cache.set('key', ('old', 1.0, time.time() + 5), 60)
+        self.cache.add('key:lock', 'someone', 60)
+        value = get_or_compute(
+            'key', self.compute, 60, cache=self.cache, beta=10 ** 6
+        )
+        self.assertEqual((value, self.calls), ('old', 0))
@@ -0,0 +1,147 @@
+import datetime as dt
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+from .. import images
+from ..models import Follow, Post, TimelineEntry, User
+from .test_images import picture
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+calls = []
+
+
+@tasks.task(priority=5)
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def failing():
+    raise ValueError('Задача упала')
+
+
+@override_settings(
+    TASKS_EAGER=False, MEDIA_ROOT=TEMP_MEDIA_ROOT, TASK_RETRY_DELAY=60
+)
+class TasksTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self):
+        call_command('run_workers', processes=1, burst=True, stdout=StringIO())
+
+    def test_delay_enqueues_and_worker_runs(self):
+        '''delay() ставит задачу в очередь, обработчик ее выполняет
+        и удаляет'''
+        record.delay('one')
+        task = Task.objects.get()
+        self.assertEqual(task.name, f'{__name__}.record')
+        self.assertEqual(task.priority, 5)
+        self.assertEqual(calls, [])
+        self.run_workers()
+        self.assertEqual(calls, ['one'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_priority_order(self):
+        '''Сначала выполняются задачи с большим приоритетом'''
+        tasks.enqueue(f'{__name__}.record', 'low', priority=0)
+        tasks.enqueue(f'{__name__}.record', 'high', priority=10)
+        self.run_workers()
+        self.assertEqual(calls, ['high', 'low'])
+
+    def test_failed_task_is_retried_then_kept(self):
+        '''Упавшая задача повторяется с паузой, а исчерпав попытки
+        остается в очереди с ошибкой'''
+        failing.delay()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.run_workers()
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn('Задача упала', task.last_error)
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.run_workers()
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+        self.run_workers()
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_task_is_claimed_once(self):
+        '''Взятую задачу не получит другой обработчик'''
+        record.delay('one')
+        self.assertIsNotNone(tasks.claim('first'))
+        self.assertIsNone(tasks.claim('second'))
+
+    def test_stale_task_is_requeued(self):
+        '''Задача упавшего обработчика возвращается в очередь'''
+        record.delay('one')
+        tasks.claim('dead')
+        Task.objects.update(locked_at=timezone.now() - dt.timedelta(
+            seconds=settings.TASK_TIMEOUT + 1
+        ))
+        self.run_workers()
+        self.assertEqual(calls, ['one'])
+
+    def test_stale_task_without_attempts_fails(self):
+        '''Брошенная задача, исчерпавшая попытки, не возвращается'''
+        failing.delay()
+        Task.objects.update(
+            status=Task.RUNNING,
+            attempts=2,
+            locked_at=timezone.now() - dt.timedelta(
+                seconds=settings.TASK_TIMEOUT + 1
+            ),
+        )
+        self.assertEqual(tasks.requeue_stale(), 0)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_uploaded_image_is_processed_by_worker(self):
+        '''Загруженную картинку обрабатывает фоновая задача'''
+        post = Post.objects.create(
+            author=TasksTests.author, text='Картинка',
+            image=picture('upload.jpg'),
+        )
+        self.assertEqual(
+            Task.objects.get().name, 'posts.tasks.process_image'
+        )
+        self.run_workers()
+        post.refresh_from_db()
+        self.assertTrue(images.is_processed(post.image.name))
+        self.assertTrue(post.thumbnail_list)
+
+    @override_settings(TIMELINE_FANOUT_INLINE_FOLLOWERS=0)
+    def test_large_fan_out_goes_to_queue(self):
+        '''Пост автора с подписчиками раскладывается по лентам в фоне'''
+        Follow.objects.create(
+            user=TasksTests.follower, author=TasksTests.author
+        )
+        post = Post.objects.create(author=TasksTests.author, text='Пост')
+        entries = TimelineEntry.objects.filter(
+            user=TasksTests.follower, post=post
+        )
+        self.assertFalse(entries.exists())
+        self.run_workers()
+        self.assertTrue(entries.exists())
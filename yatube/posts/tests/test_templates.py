@@ -0,0 +1,100 @@
+import copy
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context, Engine, engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import template_loaders
+from ..models import Group, Post, User
+
+LOCMEM_TEMPLATES = {
+    'page.html': (
+        '{% for item in items %}{% include "item.html" %}'
+        '{% include "item.html" with item="x" %}'
+        '{% include name %}{% include "nested.html" %}{% endfor %}'
+    ),
+    'item.html': '[{{ item }}]',
+    'nested.html': '{% include "item.html" %}',
+}
+
+
+def precompiled_templates():
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = [
+        ('core.template_loaders.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+    return templates
+
+
+class PrecompiledTemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Test text{i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_simple_includes_are_inlined(self):
+        '''Подставляются include без with и переменных, в том числе
+        шаблонов, чьи include уже подставлены'''
+        engine = Engine(loaders=[('core.template_loaders.Loader', [
+            ('django.template.loaders.locmem.Loader', LOCMEM_TEMPLATES),
+        ])])
+        template = engine.get_template('page.html')
+        self.assertEqual(
+            len(template.nodelist.get_nodes_by_type(
+                template_loaders.InlinedIncludeNode
+            )),
+            3,
+        )
+        self.assertEqual(
+            template.render(Context({'items': [1, 2], 'name': 'item.html'})),
+            '[1][x][1][1][2][x][2][2]',
+        )
+
+    def test_pages_render_the_same(self):
+        '''Страницы в production-режиме шаблонов не отличаются'''
+        urls = (
+            reverse('posts:posts_main'),
+            reverse('posts:posts_group', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        expected = [Client().get(url).content for url in urls]
+        cache.clear()
+        with override_settings(TEMPLATES=precompiled_templates()):
+            for url, content in zip(urls, expected):
+                with self.subTest(url=url):
+                    self.assertEqual(Client().get(url).content, content)
+
+    def test_preload_compiles_every_template(self):
+        '''При старте загружаются все шаблоны templates/'''
+        expected = sum(
+            len([file for file in files if file.endswith('.html')])
+            for _, _, files in os.walk(settings.TEMPLATES_DIR)
+        )
+        with override_settings(TEMPLATES=precompiled_templates()):
+            self.assertEqual(template_loaders.preload(), expected)
+            engine = engines.all()[0].engine
+            self.assertIs(
+                engine.get_template('posts/index.html'),
+                engine.get_template('posts/index.html'),
+            )
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 from http import HTTPStatus
 
@@ -52,6 +53,9 @@ class PostsURLTests(TestCase):
         self.authorized_client.force_login(self.user)
         self.author = Client()
         self.author.force_login(PostsURLTests.user)
+        # общая часть страниц кэшируется для всех, а тесты проверяют
+        # шаблоны и контекст представлений
+        cache.clear()
         self.post_id = PostsURLTests.post.id
         self.url_post = f'/posts/{self.post_id}/'
         self.url_post_edit = f'/posts/{self.post_id}/edit/'
@@ -70,6 +74,7 @@ class PostsURLTests(TestCase):
             URL_FOLLOW_INDEX: HTTPStatus.FOUND,
             self.url_add_comment: HTTPStatus.FOUND,
             '/unexisting_page/': HTTPStatus.NOT_FOUND,
+            '/profile/nobody/': HTTPStatus.NOT_FOUND,
         }
         for adress, status in adresses_statuses.items():
             with self.subTest(adress=adress):
@@ -1,16 +1,25 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import IntegrityError
-from django.test import Client, TestCase, override_settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from ..models import Comment, Follow, Post, Group, User
-from yatube.settings import POSTS_PER_PAGE
+from core.paginators import NEXT, encode_cursor
+from .. import feed_cache, follows, thumbnails, timelines
+from ..models import (
+    Comment, Follow, Post, Group, TimelineEntry, User, UserStats
+)
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -51,6 +60,18 @@ class PostsPagesTests(TestCase):
         self.authorized_client.force_login(self.user)
         self.author = Client()
         self.author.force_login(PostsPagesTests.user)
+        # общая часть страниц кэшируется для всех, а тесты проверяют
+        # шаблоны и контекст представлений
+        cache.clear()
+
+    def get_last_page(self, url):
+        '''Проходит ленту по курсорам и возвращает последнюю страницу'''
+        response = self.authorized_client.get(url)
+        while response.context['page_obj'].has_next():
+            response = self.authorized_client.get(
+                url, {'cursor': response.context['page_obj'].next_cursor}
+            )
+        return response
 
     def test_pages_use_correct_templates(self):
         '''URL-адреса используют корректные шаблоны'''
@@ -177,10 +198,7 @@ class PostsPagesTests(TestCase):
 
     def test_posts_main_last_page_contains_right_number_of_posts(self):
         '''Проверка количества постов на последней странице posts_main'''
-        response = self.authorized_client.get(
-            reverse('posts:posts_main') + '?page='
-            + str(Post.objects.count() // POSTS_PER_PAGE + 1)
-        )
+        response = self.get_last_page(reverse('posts:posts_main'))
         self.assertEqual(len(response.context['page_obj']),
                          Post.objects.count() % POSTS_PER_PAGE)
 
@@ -199,10 +217,9 @@ class PostsPagesTests(TestCase):
     def test_posts_group_last_page_contains_right_number_of_posts(self):
         '''Проверка количества постов на последней странице posts_group'''
         group_posts = Post.objects.filter(group__slug='test-slug1')
-        response = self.authorized_client.get(
-            reverse('posts:posts_group', kwargs={'slug': 'test-slug1'})
-            + '?page=' + str(group_posts.count() // POSTS_PER_PAGE + 1)
-        )
+        response = self.get_last_page(reverse(
+            'posts:posts_group', kwargs={'slug': 'test-slug1'}
+        ))
         self.assertEqual(len(response.context['page_obj']),
                          group_posts.count() % POSTS_PER_PAGE)
 
@@ -221,10 +238,9 @@ class PostsPagesTests(TestCase):
     def test_profile_last_page_contains_right_number_of_posts(self):
         '''Проверка количества постов на последней странице profile'''
         profile_posts = Post.objects.filter(author__username='auth')
-        response = self.authorized_client.get(
-            reverse('posts:profile', kwargs={'username': 'auth'})
-            + '?page=' + str(profile_posts.count() // POSTS_PER_PAGE + 1)
-        )
+        response = self.get_last_page(reverse(
+            'posts:profile', kwargs={'username': 'auth'}
+        ))
         self.assertEqual(len(response.context['page_obj']),
                          profile_posts.count() % POSTS_PER_PAGE)
 
@@ -303,6 +319,208 @@ class PostsPagesTests(TestCase):
         self.assertIn(self.test_comment, comments)
 
 
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        for i in range(POSTS_PER_PAGE * 2 + 5):
+            Post.objects.create(author=cls.user, text=f'Test text{i}')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.url = reverse('posts:posts_main')
+        # страницы для анонимов кэшируются целиком, а тесты читают context
+        cache.clear()
+
+    def test_pages_cover_feed_without_gaps(self):
+        '''Проход по курсорам выдает каждый пост ровно один раз,
+        даже если во время обхода появились новые посты'''
+        seen = []
+        response = self.guest_client.get(self.url)
+        while True:
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+            Post.objects.create(author=CursorPaginationTests.user,
+                                text='Fresh post')
+            if not page_obj.has_next():
+                break
+            response = self.guest_client.get(
+                self.url, {'cursor': page_obj.next_cursor}
+            )
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), POSTS_PER_PAGE * 2 + 5)
+
+    def test_previous_cursor_returns_previous_page(self):
+        '''Курсор назад возвращает ту же страницу, с которой ушли'''
+        first = self.guest_client.get(self.url).context['page_obj']
+        second = self.guest_client.get(
+            self.url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertTrue(second.has_previous())
+        back = self.guest_client.get(
+            self.url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        '''Некорректный курсор открывает первую страницу'''
+        first = self.guest_client.get(self.url).context['page_obj']
+        response = self.guest_client.get(self.url, {'cursor': 'broken!'})
+        self.assertEqual(list(response.context['page_obj']), list(first))
+
+    def test_cursor_with_huge_id_returns_first_page(self):
+        '''Курсор с id за пределами INTEGER считается некорректным'''
+        last = Post.objects.order_by('created', 'pk').first()
+        last.pk = 10 ** 30
+        first = self.guest_client.get(self.url).context['page_obj']
+        response = self.guest_client.get(
+            self.url, {'cursor': encode_cursor(last, NEXT)}
+        )
+        self.assertEqual(list(response.context['page_obj']), list(first))
+
+    def test_cursor_past_the_end_returns_empty_page(self):
+        '''Верный курсор за краем ленты дает пустую страницу'''
+        last = Post.objects.order_by('created', 'pk').first()
+        cursor = encode_cursor(last, NEXT)
+        page_obj = self.guest_client.get(
+            self.url, {'cursor': cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page_obj), [])
+        self.assertIsNone(page_obj.next_cursor)
+        back = self.guest_client.get(
+            self.url, {'cursor': page_obj.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back)[-1], last)
+
+    def test_feed_page_does_not_count_rows(self):
+        '''Страница ленты не выполняет COUNT(*) и OFFSET'''
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(self.url)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+                self.assertNotIn('OFFSET', query['sql'].upper())
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedQueriesTests.reader)
+        cache.clear()
+
+    def add_posts(self, count):
+        for i in range(count):
+            author, _ = User.objects.get_or_create(username=f'author{i}')
+            Follow.objects.get_or_create(
+                user=FeedQueriesTests.reader, author=author
+            )
+            Post.objects.create(
+                author=author,
+                group=FeedQueriesTests.group,
+                text=f'Test text{i}',
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        '''Число запросов ленты не растет с числом постов на странице'''
+        urls = (
+            reverse('posts:posts_main'),
+            reverse('posts:posts_group', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'author0'}),
+            reverse('posts:follow_index'),
+        )
+        self.add_posts(1)
+        single = {url: self.count_queries(url) for url in urls}
+        self.add_posts(POSTS_PER_PAGE)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='Text')
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+
+    def add_comments(self, count):
+        for i in range(count):
+            commenter, _ = User.objects.get_or_create(username=f'reader{i}')
+            Comment.objects.create(
+                author=commenter,
+                post=CommentsPaginationTests.post,
+                text=f'Comment {i}',
+            )
+
+    def count_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.detail_url)
+        return len(queries)
+
+    def test_detail_shows_first_page_of_comments(self):
+        '''На странице поста только первая страница комментариев'''
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, f'Comment {COMMENTS_PER_PAGE + 4}')
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_query_count_does_not_depend_on_comments(self):
+        '''Авторы комментариев загружаются вместе с комментариями'''
+        self.add_comments(1)
+        single = self.count_queries()
+        self.add_comments(COMMENTS_PER_PAGE)
+        self.assertEqual(self.count_queries(), single)
+
+    def test_fragment_endpoint_returns_next_page(self):
+        '''JSON-фрагмент отдает следующую страницу комментариев'''
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        first = self.client.get(self.detail_url).context['comments']
+        response = self.client.get(
+            self.comments_url, {'cursor': first.next_cursor}
+        )
+        data = response.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertIn('Comment 0', data['html'])
+        self.assertNotIn(f'Comment {COMMENTS_PER_PAGE}<', data['html'])
+        self.assertEqual(data['html'].count('class="media mb-4"'), 5)
+
+    def test_fragment_endpoint_unknown_post(self):
+        response = self.client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': 10 ** 6}
+        ))
+        self.assertEqual(response.status_code, 404)
+
+
 class PostsCacheTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -320,19 +538,137 @@ class PostsCacheTests(TestCase):
             author=PostsCacheTests.author,
             text='another text',
         )
+        cache.clear()
 
     def test_posts_main_cache(self):
         '''Проверка работы кэша на главной странице'''
         the_reverse = reverse('posts:posts_main')
         response = self.guest_client.get(the_reverse)
         self.assertContains(response, self.post.text)
-        self.post.delete()
+        # update() не шлет сигналов, поэтому кэш остается прежним
+        Post.objects.filter(pk=self.post.pk).update(text='changed text')
         response = self.guest_client.get(the_reverse)
         self.assertContains(response, self.post.text)
         cache.clear()
         response = self.guest_client.get(the_reverse)
         self.assertNotContains(response, self.post.text)
 
+    def test_posts_main_cache_invalidated_on_delete(self):
+        '''Удаленный пост сразу пропадает из закэшированных лент'''
+        reverses = (
+            reverse('posts:posts_main'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for the_reverse in reverses:
+            with self.subTest(the_reverse=the_reverse):
+                response = self.guest_client.get(the_reverse)
+                self.assertContains(response, self.post.text)
+        self.post.delete()
+        for the_reverse in reverses:
+            with self.subTest(the_reverse=the_reverse):
+                response = self.guest_client.get(the_reverse)
+                self.assertNotContains(response, self.post.text)
+
+    def test_posts_main_cache_depends_on_page(self):
+        '''Вторая страница не отдает закэшированную первую'''
+        for i in range(POSTS_PER_PAGE):
+            Post.objects.create(
+                author=PostsCacheTests.author, text=f'page text{i}'
+            )
+        the_reverse = reverse('posts:posts_main')
+        first = self.guest_client.get(the_reverse)
+        second = self.guest_client.get(
+            the_reverse, {'cursor': first.context['page_obj'].next_cursor}
+        )
+        self.assertContains(second, 'just a text')
+        self.assertNotContains(second, f'page text{POSTS_PER_PAGE - 1}')
+
+    def test_follow_cache_depends_on_viewer(self):
+        '''Лента подписок одного пользователя не видна другому'''
+        follower = User.objects.create_user(username='follower')
+        stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=follower, author=PostsCacheTests.author)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        stranger_client = Client()
+        stranger_client.force_login(stranger)
+        the_reverse = reverse('posts:follow_index')
+        self.assertContains(follower_client.get(the_reverse), self.post.text)
+        self.assertNotContains(
+            stranger_client.get(the_reverse), self.post.text
+        )
+
+    def test_follow_cache_refreshed_by_author_generation(self):
+        '''Новый пост сразу виден в закэшированной ленте подписок, хотя
+        поколения лент подписчиков не сбрасываются по одному'''
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=PostsCacheTests.author)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        the_reverse = reverse('posts:follow_index')
+        follower_client.get(the_reverse)
+        follow_feed = (feed_cache.FOLLOW, follower.pk)
+        before = feed_cache.get_generations(follow_feed)
+        Post.objects.create(author=PostsCacheTests.author, text='fresh post')
+        self.assertEqual(feed_cache.get_generations(follow_feed), before)
+        self.assertContains(follower_client.get(the_reverse), 'fresh post')
+
+    def test_thumbnails_replace_original_in_cached_feed(self):
+        '''Готовые миниатюры сразу заменяют исходную картинку в ленте'''
+        the_reverse = reverse('posts:posts_main')
+        self.post.thumbnail_list = ''
+        self.post.save()
+        self.guest_client.get(the_reverse)
+        self.post.thumbnail_list = '/media/cache/thumb.jpg'
+        self.post.save(update_fields=['thumbnail_list'])
+        self.assertContains(
+            self.guest_client.get(the_reverse), '/media/cache/thumb.jpg'
+        )
+
+    def test_comments_cache_invalidated_on_comment(self):
+        '''Новый комментарий сразу появляется на странице поста'''
+        the_reverse = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.guest_client.get(the_reverse)
+        Comment.objects.create(
+            author=PostsCacheTests.author,
+            post=self.post,
+            text='fresh comment',
+        )
+        response = self.guest_client.get(the_reverse)
+        self.assertContains(response, 'fresh comment')
+
+
+class FeedInvalidationCommitTests(TransactionTestCase):
+    def test_feeds_are_invalidated_again_after_commit(self):
+        '''Фрагмент, собранный до коммита, не переживает коммит'''
+        author = User.objects.create_user(username='auth')
+        feeds = ((feed_cache.INDEX, None), (feed_cache.PROFILE, author.pk))
+        with transaction.atomic():
+            Post.objects.create(author=author, text='Committed')
+            # поколение, под которым другой запрос собрал бы ленту
+            # из данных до коммита
+            before_commit = feed_cache.get_generations(*feeds)
+            self.assertEqual(
+                feed_cache.get_generations(*feeds), before_commit
+            )
+        self.assertNotEqual(
+            feed_cache.get_generations(*feeds), before_commit
+        )
+        reader = User.objects.create_user(username='reader')
+        with transaction.atomic():
+            Follow.objects.create(user=reader, author=author)
+            # другой запрос еще не видит подписку и кэширует пустое
+            # множество под уже новой версией
+            cache.set(
+                follows.FOLLOWED_KEY.format(
+                    reader.pk, follows.get_version(reader.pk)
+                ),
+                frozenset(), settings.FOLLOWED_CACHE_TIMEOUT,
+            )
+        self.assertIn(author.pk, follows.get_followed_ids(reader))
+
 
 class FollowViewsTests(TestCase):
     @classmethod
@@ -420,3 +756,485 @@ class FollowViewsTests(TestCase):
                 user=self.user_follower,
                 author=FollowViewsTests.author,
             )
+
+    def test_repeated_follow_is_idempotent(self):
+        '''Повторная подписка не пытается вставить дубль'''
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': FollowViewsTests.author.username}
+        )
+        self.follower.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.follower.get(url)
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith('INSERT')
+            and Follow._meta.db_table in query['sql']
+        ])
+        self.assertEqual(Follow.objects.filter(
+            user=self.user_follower
+        ).count(), 1)
+
+    def test_follow_unknown_user_returns_404(self):
+        '''Подписка на несуществующего пользователя отдает 404'''
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                response = self.follower.get(reverse(
+                    name, kwargs={'username': 'nobody'}
+                ))
+                self.assertEqual(response.status_code, 404)
+
+    def test_follow_service(self):
+        '''Сервис подписок сообщает, изменилось ли что-нибудь'''
+        author = FollowViewsTests.author
+        self.assertFalse(follows.follow(
+            self.user_follower, self.user_follower
+        ))
+        self.assertTrue(follows.follow(self.user_follower, author))
+        self.assertFalse(follows.follow(self.user_follower, author))
+        self.assertTrue(follows.unfollow(self.user_follower, author))
+        self.assertFalse(follows.unfollow(self.user_follower, author))
+
+    def test_follow_counters_shift_without_recount(self):
+        '''Подписка и отписка сдвигают счетчики, не пересчитывая
+        подписчиков автора'''
+        author = FollowViewsTests.author
+        with CaptureQueriesContext(connection) as queries:
+            follows.follow(self.user_follower, author)
+            follows.unfollow(self.user_follower, author)
+            follows.follow(self.user_follower, author)
+        self.assertFalse([
+            query for query in queries if 'COUNT(' in query['sql']
+        ])
+        self.assertEqual(UserStats.objects.get(
+            user=author
+        ).followers_count, 1)
+        self.assertEqual(UserStats.objects.get(
+            user=self.user_follower
+        ).following_count, 1)
+
+    def test_bulk_follow_and_unfollow(self):
+        '''Импорт списка подписок обновляет счетчики и ленту'''
+        author = FollowViewsTests.author
+        other_post = Post.objects.create(
+            author=self.user_not_follower, text='other text'
+        )
+        Follow.objects.create(user=self.user_follower, author=author)
+        added = follows.bulk_follow(self.user_follower, [
+            author.pk, self.user_not_follower.pk, self.user_follower.pk,
+            10 ** 6,
+        ])
+        self.assertEqual(added, 1)
+        follower_stats = UserStats.objects.get(user=self.user_follower)
+        author_stats = UserStats.objects.get(user=self.user_not_follower)
+        self.assertEqual(follower_stats.following_count, 2)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user_follower, post=other_post
+        ).exists())
+        with CaptureQueriesContext(connection) as queries:
+            removed = follows.bulk_unfollow(
+                self.user_follower, [author.pk, self.user_not_follower.pk]
+            )
+        self.assertEqual(removed, 2)
+        stats_updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_userstats"')
+        ]
+        self.assertEqual(len(stats_updates), 1)
+        follower_stats.refresh_from_db()
+        author_stats.refresh_from_db()
+        self.assertEqual(follower_stats.following_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user_follower
+        ).exists())
+
+
+class FollowedAuthorsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Text')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(FollowedAuthorsTests.reader)
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': 'auth'}
+        )
+
+    def follow_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        follow_table = Follow._meta.db_table
+        return response, [
+            query for query in queries if follow_table in query['sql']
+        ]
+
+    def test_followed_ids_are_cached(self):
+        '''Подписки зрителя читаются из кэша, а не из базы'''
+        Follow.objects.create(
+            user=FollowedAuthorsTests.reader,
+            author=FollowedAuthorsTests.author,
+        )
+        self.reader_client.get(self.profile_url)
+        response, queries = self.follow_queries(self.profile_url)
+        self.assertEqual(queries, [])
+        self.assertTrue(response.context['following'])
+
+    def test_late_cache_write_is_not_read(self):
+        '''Множество, собранное до подписки, не читается после нее'''
+        reader = FollowedAuthorsTests.reader
+        stale_key = follows.FOLLOWED_KEY.format(
+            reader.pk, follows.get_version(reader.pk)
+        )
+        Follow.objects.create(
+            user=reader, author=FollowedAuthorsTests.author
+        )
+        # запрос, начатый до подписки, дописывает свой ответ в кэш
+        cache.set(stale_key, frozenset(), settings.FOLLOWED_CACHE_TIMEOUT)
+        self.assertIn(
+            FollowedAuthorsTests.author.pk, follows.get_followed_ids(reader)
+        )
+
+    def test_follow_and_unfollow_reset_cache(self):
+        '''Подписка и отписка сразу видны на странице автора'''
+        self.assertFalse(
+            self.reader_client.get(self.profile_url).context['following']
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'auth'}
+        ))
+        self.assertTrue(
+            self.reader_client.get(self.profile_url).context['following']
+        )
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'auth'}
+        ))
+        self.assertFalse(
+            self.reader_client.get(self.profile_url).context['following']
+        )
+
+    def test_post_page_knows_following(self):
+        '''Страница поста знает, подписан ли зритель на автора'''
+        Follow.objects.create(
+            user=FollowedAuthorsTests.reader,
+            author=FollowedAuthorsTests.author,
+        )
+        url = reverse(
+            'posts:post_detail',
+            kwargs={'post_id': FollowedAuthorsTests.post.pk},
+        )
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'отписаться от автора')
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        '''Подписка добавляет в ленту уже написанные посты автора'''
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=TimelineTests.old_post
+        ).exists())
+        self.assertIn(TimelineTests.old_post, self.get_feed())
+
+    def test_new_post_fans_out_to_followers(self):
+        '''Новый пост раскладывается по лентам подписчиков'''
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        new_post = Post.objects.create(
+            author=TimelineTests.author, text='new'
+        )
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=new_post
+        ).exists())
+        self.assertEqual(self.get_feed(), [new_post, TimelineTests.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        '''Отписка убирает посты автора из ленты'''
+        follow = Follow.objects.create(
+            user=self.reader, author=TimelineTests.author
+        )
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader
+        ).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_posts_read_on_the_fly(self):
+        '''Посты популярных авторов не раскладываются, но видны в ленте'''
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        new_post = Post.objects.create(
+            author=TimelineTests.author, text='new'
+        )
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader
+        ).exists())
+        self.assertEqual(self.get_feed(), [new_post, TimelineTests.old_post])
+
+    def test_author_crossing_threshold_keeps_entries(self):
+        '''Разложенные посты автора, ставшего популярным, остаются
+        в ленте и не дублируются постами, дочитанными на лету'''
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        with override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0):
+            new_post = Post.objects.create(
+                author=TimelineTests.author, text='new'
+            )
+            self.assertTrue(TimelineEntry.objects.filter(
+                user=self.reader, post=TimelineTests.old_post
+            ).exists())
+            self.assertEqual(
+                self.get_feed(), [new_post, TimelineTests.old_post]
+            )
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_pages_merge_timeline_and_read_on_fly(self):
+        '''Страницы ленты сливают разложенные и дочитанные посты
+        по дате в обе стороны'''
+        popular = User.objects.create_user(username='popular')
+        for number in range(2):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'fan{number}'),
+                author=popular,
+            )
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        Follow.objects.create(user=self.reader, author=popular)
+        for number in range(3):
+            Post.objects.create(author=popular, text=f'popular {number}')
+            Post.objects.create(
+                author=TimelineTests.author, text=f'auth {number}'
+            )
+        expected = list(Post.objects.filter(
+            author__in=[TimelineTests.author, popular]
+        ).order_by('-created', '-id'))
+        paginator = timelines.TimelinePaginator(
+            self.reader, Post.objects.feed(), 2
+        )
+        pages = [paginator.get_page(None)]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual(
+            [post for page in pages for post in page], expected
+        )
+        previous = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[-2]))
+
+    @override_settings(TIMELINE_BACKFILL_POSTS=2)
+    def test_history_beyond_backfill_is_read_on_the_fly(self):
+        '''Посты старше скопированных при подписке тоже есть в ленте'''
+        for number in range(4):
+            Post.objects.create(
+                author=TimelineTests.author, text=f'history {number}'
+            )
+        follow = Follow.objects.create(
+            user=self.reader, author=TimelineTests.author
+        )
+        follow.refresh_from_db()
+        self.assertIsNotNone(follow.timeline_from)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        expected = list(Post.objects.filter(
+            author=TimelineTests.author
+        ).order_by('-created', '-id'))
+        paginator = timelines.TimelinePaginator(
+            self.reader, Post.objects.feed(), 2
+        )
+        pages = [paginator.get_page(None)]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual(
+            [post for page in pages for post in page], expected
+        )
+
+    def test_rebuild_timelines_command(self):
+        '''Команда rebuild_timelines восстанавливает ленту по подпискам'''
+        Follow.objects.create(user=self.reader, author=TimelineTests.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', 'reader', stdout=StringIO())
+        self.assertIn(TimelineTests.old_post, self.get_feed())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    PIC_GIF = (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=ThumbnailsTests.author,
+            text='Пост с картинкой',
+            image=self.picture('thumb.gif'),
+        )
+
+    def picture(self, name):
+        return SimpleUploadedFile(
+            name=name, content=self.PIC_GIF, content_type='image/gif'
+        )
+
+    def test_generate_stores_thumbnail_urls(self):
+        '''Готовые миниатюры сохраняются в посте и выводятся в шаблонах'''
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        for field in settings.THUMBNAIL_GEOMETRIES:
+            with self.subTest(field=field):
+                self.assertTrue(getattr(self.post, field))
+        pages = (
+            (reverse('posts:posts_main'), self.post.thumbnail_list),
+            (reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+             self.post.thumbnail_detail),
+        )
+        for url, thumbnail in pages:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), thumbnail)
+
+    def test_original_is_shown_until_thumbnails_are_ready(self):
+        '''Пока миниатюр нет, шаблон показывает исходную картинку'''
+        response = self.client.get(reverse('posts:posts_main'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_new_image_resets_thumbnails(self):
+        '''Замена картинки сбрасывает устаревшие миниатюры'''
+        thumbnails.generate(self.post.pk)
+        self.post.refresh_from_db()
+        self.post.image = self.picture('another.gif')
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_list, '')
+        self.assertEqual(self.post.thumbnail_detail, '')
+
+    def test_generate_thumbnails_command(self):
+        '''Команда generate_thumbnails готовит недостающие миниатюры'''
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail_list)
+        self.assertTrue(self.post.thumbnail_detail)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Test group',
+            slug='test-slug',
+            description='Test description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Text'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.urls = (
+            reverse('posts:posts_main'),
+            reverse('posts:posts_group', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': ConditionalGetTests.post.pk},
+            ),
+        )
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_answer_not_modified(self):
+        '''Неизменившаяся страница отдается как 304'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.revalidate(self.client, url)
+                self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_view(self):
+        '''Ответ 304 гостю не обращается к базе'''
+        url = reverse('posts:posts_main')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_viewer(self):
+        '''Гость и пользователь получают разные ETag'''
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'],
+                    self.reader_client.get(url)['ETag'],
+                )
+
+    def test_changes_update_etag(self):
+        '''Новые посты, комментарии и подписки меняют ETag'''
+        index, group, profile, detail = self.urls
+        changes = (
+            (index, lambda: Post.objects.create(
+                author=ConditionalGetTests.author, text='New'
+            )),
+            (group, lambda: Post.objects.create(
+                author=ConditionalGetTests.author,
+                group=ConditionalGetTests.group,
+                text='New',
+            )),
+            (profile, lambda: Follow.objects.create(
+                user=ConditionalGetTests.reader,
+                author=ConditionalGetTests.author,
+            )),
+            (detail, lambda: Comment.objects.create(
+                author=ConditionalGetTests.reader,
+                post=ConditionalGetTests.post,
+                text='Comment',
+            )),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                etag = self.reader_client.get(url)['ETag']
+                change()
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
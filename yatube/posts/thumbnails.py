@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections
+from sorl.thumbnail import get_thumbnail
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def generate(post_id):
+    '''Готовит миниатюры поста и сохраняет их адреса в строке поста'''
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    for field, (geometry, options) in settings.THUMBNAIL_GEOMETRIES.items():
+        setattr(
+            post, field, get_thumbnail(post.image, geometry, **options).url
+        )
+    # сохранение шлет post_save, и ленты с постом сбрасываются из кэша,
+    # чтобы вместо исходной картинки показать миниатюру
+    post.save(update_fields=list(settings.THUMBNAIL_GEOMETRIES))
+
+
+def retry_locked(task, post_id, attempts=5):
+    '''Повторяет идемпотентную задачу, если база занята.
+
+    SQLite отвечает «database is locked» сразу, без ожидания, когда две
+    транзакции сначала читают, а потом пишут (так сохраняются посты).
+    '''
+    for attempt in range(attempts):
+        try:
+            return task(post_id)
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+
+
+def run(post_id):
+    '''Задача пула: своя сессия с базой и ошибки только в лог'''
+    close_old_connections()
+    try:
+        retry_locked(generate, post_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s', post_id)
+    finally:
+        close_old_connections()
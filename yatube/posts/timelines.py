@@ -0,0 +1,153 @@
+'''Материализованные ленты подписок.
+
+Новый пост раскладывается в TimelineEntry всех подписчиков автора
+(fan-out on write) вместе с датой поста, и страница ленты подписок
+читается по индексу (user, -created, post) этой таблицы. Посты авторов,
+у которых больше TIMELINE_FANOUT_MAX_FOLLOWERS подписчиков, не
+раскладываются: они дочитываются отдельным упорядоченным запросом
+(fan-out on read), чтобы один пост не порождал миллионы строк. Записи,
+разложенные до того, как автор стал популярным, остаются в лентах.
+
+При подписке в ленту копируются только последние TIMELINE_BACKFILL_POSTS
+постов автора; дата первого нескопированного сохраняется в
+Follow.timeline_from, и посты не новее нее тоже дочитываются на лету.
+'''
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+
+from core.paginators import NEXT, CursorPaginator, after
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def followers_count(author_id):
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def is_fanout_author(author_id):
+    return followers_count(author_id) <= settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+def fan_out_post(post):
+    '''Добавляет новый пост в ленты подписчиков автора'''
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id, user__isnull=False
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post,
+                          author_id=post.author_id, created=post.created)
+            for user_id in followers.iterator()
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    '''Добавляет в ленту пользователя последние посты нового автора.
+    Если копируются не все, запоминает в подписке, с какой даты лента
+    полна'''
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id)
+    horizon = posts.order_by('-created', '-id').values_list(
+        'created', flat=True
+    )[settings.TIMELINE_BACKFILL_POSTS:settings.TIMELINE_BACKFILL_POSTS + 1]
+    timeline_from = None
+    if horizon:
+        # посты с той же датой, что и первый нескопированный, тоже
+        # дочитываются, поэтому граница проходит ровно по дате
+        timeline_from = horizon[0]
+        posts = posts.filter(created__gt=timeline_from)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, created=created)
+            for post_id, created in posts.values_list('id', 'created')
+        ),
+        ignore_conflicts=True,
+    )
+    Follow.objects.filter(user_id=user_id, author_id=author_id).update(
+        timeline_from=timeline_from
+    )
+
+
+def trim(user_id, author_id):
+    '''Убирает из ленты пользователя посты автора, от которого он отписался'''
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    '''Собирает ленту пользователя заново по его подпискам'''
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(
+        user_id=user_id, author__isnull=False
+    ).values_list('author_id', flat=True)
+    for author_id in authors:
+        backfill(user_id, author_id)
+
+
+def read_on_fly_authors(user_id):
+    '''Авторы из подписок, чьи посты не раскладываются по лентам'''
+    return list(Follow.objects.filter(
+        user_id=user_id,
+        author__stats__followers_count__gt=(
+            settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values_list('author_id', flat=True))
+
+
+def read_on_fly(user_id):
+    '''Условие на посты из подписок, которых нет в ленте: посты
+    популярных авторов и посты старше скопированных при подписке.
+    None, если таких нет'''
+    conditions = [
+        Q(author_id=author_id, created__lte=timeline_from)
+        for author_id, timeline_from in Follow.objects.filter(
+            user_id=user_id, timeline_from__isnull=False
+        ).values_list('author_id', 'timeline_from')
+    ]
+    authors = read_on_fly_authors(user_id)
+    if authors:
+        conditions.append(Q(author_id__in=authors))
+    return reduce(or_, conditions) if conditions else None
+
+
+class TimelinePaginator(CursorPaginator):
+    '''Лента подписок user: позиции постов страницы берутся из
+    TimelineEntry и из постов популярных авторов, сливаются по
+    (created, id), а сами посты читаются из object_list по id'''
+
+    def __init__(self, user, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.user = user
+
+    def fetch(self, position):
+        limit = self.per_page + 1
+        # пост, разложенный до роста автора, найдется в обеих выборках
+        found = dict(after(
+            TimelineEntry.objects.filter(user=self.user), position, 'post_id'
+        ).values_list('post_id', 'created')[:limit])
+        on_fly = read_on_fly(self.user.pk)
+        if on_fly is not None:
+            found.update(after(
+                Post.objects.filter(on_fly), position
+            ).values_list('id', 'created')[:limit])
+        keys = sorted(
+            ((created, pk) for pk, created in found.items()),
+            reverse=position is None or position[2] == NEXT,
+        )[:limit]
+        posts = self.object_list.in_bulk([pk for _, pk in keys])
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+
+def get_timeline_page(request, object_list, per_page):
+    '''Страница ленты подписок зрителя по параметру ?cursor='''
+    paginator = TimelinePaginator(request.user, object_list, per_page)
+    return paginator.get_page(request.GET.get('cursor'))
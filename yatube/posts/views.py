@@ -1,84 +1,181 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.utils.functional import SimpleLazyObject
 
+from . import feed_cache, follows, search, timelines
 from .forms import PostForm, CommentForm
-from .models import Follow, Group, Post, User
-from yatube.settings import POSTS_PER_PAGE
+from .models import Comment, Group, Post, User
+from core.db_router import replica_reads
+from core.paginators import get_cursor_page
+from yatube.settings import COMMENTS_PER_PAGE, POSTS_PER_PAGE
 
 
+def index_feeds(request):
+    return [(feed_cache.INDEX, None)]
+
+
+@replica_reads
+@feed_cache.conditional(index_feeds)
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    posts = Post.objects.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cache_context = feed_cache.feed_cache_context(request, feed_cache.INDEX)
+    posts = Post.objects.feed()
+    page_obj = get_cursor_page(request, posts, POSTS_PER_PAGE)
     context = {
         'page_obj': page_obj,
         'title': title,
+        **cache_context,
     }
     return render(request, template, context)
 
 
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(search.search(query), POSTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    # посты страницы одним запросом, в порядке релевантности
+    posts = Post.objects.feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[post_id] for post_id in page_obj.object_list
+        if post_id in posts
+    ]
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'title': f'Поиск: {query}' if query else 'Поиск',
+    }
+    return render(request, template, context)
+
+
+def group_feeds(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first()
+    if group_id is None:
+        return None
+    return [(feed_cache.GROUP, group_id)]
+
+
+@replica_reads
+@feed_cache.conditional(group_feeds)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cache_context = feed_cache.feed_cache_context(
+        request, feed_cache.GROUP, group.pk
+    )
+    posts = group.posts.feed()
+    page_obj = get_cursor_page(request, posts, POSTS_PER_PAGE)
     title = f'Записи сообщества {group}'
     context = {
         'title': title,
         'group': group,
         'page_obj': page_obj,
+        **cache_context,
     }
     return render(request, template, context)
 
 
+def profile_feeds(request, username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    feeds = [(feed_cache.PROFILE, author_id)]
+    if request.user.is_authenticated:
+        # лента подписок зрителя меняется при подписке и отписке,
+        # от которых зависит кнопка на странице автора
+        feeds.append((feed_cache.FOLLOW, request.user.pk))
+    return feeds
+
+
+@replica_reads
+@feed_cache.conditional(profile_feeds)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = User.objects.get(username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    cache_context = feed_cache.feed_cache_context(
+        request, feed_cache.PROFILE, author.pk
+    )
+    posts = author.posts.feed()
+    page_obj = get_cursor_page(request, posts, POSTS_PER_PAGE)
     title = f'Профайл пользователя {author.get_full_name()}'
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
     context = {
         'author': author,
-        'following': following,
         'page_obj': page_obj,
         'title': title,
+        **cache_context,
     }
     return render(request, template, context)
 
 
+def post_detail_feeds(request, post_id):
+    author_id = Post.objects.filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).first()
+    if author_id is None:
+        return None
+    # правка поста и счетчик постов автора сбрасывают ленту профиля
+    feeds = [(feed_cache.COMMENTS, post_id), (feed_cache.PROFILE, author_id)]
+    if request.user.is_authenticated:
+        # от подписок зрителя зависит кнопка подписки на автора
+        feeds.append((feed_cache.FOLLOW, request.user.pk))
+    return feeds
+
+
+@replica_reads
+@feed_cache.conditional(post_detail_feeds)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
-    form = CommentForm(request.POST or None)
-    if post.author == request.user:
-        editable = True
-    else:
-        editable = False
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id
+    )
+    cache_context = feed_cache.feed_cache_context(
+        request, feed_cache.COMMENTS, post.pk
+    )
+    # комментарии читаются, только если фрагмента нет в кэше
+    comments = SimpleLazyObject(lambda: get_comments_page(request, post.pk))
     context = {
         'comments': comments,
-        'editable': editable,
-        'form': form,
         'post': post,
         'title': post,
+        **cache_context,
     }
     return render(request, template, context)
 
 
+def get_comments_page(request, post_id):
+    '''Страница комментариев поста вместе с авторами'''
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('id', 'text', 'created', 'post_id', 'author__username')
+    return get_cursor_page(request, comments, COMMENTS_PER_PAGE)
+
+
+def post_comments(request, post_id):
+    '''Следующая страница комментариев для подгрузки на странице поста'''
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(request, post.pk)
+    html = render_to_string(
+        'includes/comment_list.html',
+        {'comments': comments, 'post': post},
+        request,
+    )
+    return JsonResponse({
+        'html': html,
+        'next_cursor': comments.next_cursor,
+    })
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -140,41 +237,38 @@ def add_comment(request, post_id):
 
 
 @login_required
+@replica_reads
 def follow_index(request):
     # Не понимаю зачем по заданию новый template, если есть 'posts/index.html'
     template = 'posts/follow.html'
     title = 'Посты избранных авторов'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cache_context = feed_cache.feed_cache_context(
+        request, feed_cache.FOLLOW, request.user.pk, personal=True,
+        sources=[
+            (feed_cache.PROFILE, author_id)
+            for author_id in follows.followed_ids(request)
+        ],
+    )
+    page_obj = timelines.get_timeline_page(
+        request, Post.objects.feed(), POSTS_PER_PAGE
+    )
     context = {
         'page_obj': page_obj,
         'title': title,
+        **cache_context,
     }
     return render(request, template, context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = User.objects.get(username=username)
-    # Есть сомнения, что IntegrityError должен решаться так
-    # но иначе не получилось пройти тесты
-    try:
-        Follow.objects.create(
-            user=request.user,
-            author=author,
-        )
-    finally:
-        return redirect('posts:follow_index')
+    author = get_object_or_404(User, username=username)
+    follows.follow(request.user, author)
+    return redirect('posts:follow_index')
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = User.objects.get(username=username)
-    follow = Follow.objects.filter(
-        user=request.user,
-        author=author,
-    )
-    follow.delete()
+    author = get_object_or_404(User, username=username)
+    follows.unfollow(request.user, author)
     return redirect('posts:follow_index')
@@ -0,0 +1,12 @@
+from django.core.mail import EmailMultiAlternatives
+
+from core.tasks import task
+
+
+@task(priority=5)
+def send_email(subject, body, from_email, recipients, html=None):
+    '''Отправка письма, собранного во время запроса'''
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
@@ -1,9 +1,13 @@
 from django.urls import reverse_lazy
-from django.test import Client, TestCase
+from django.core import mail
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from http import HTTPStatus
 
+from core import tasks
+from core.models import Task
+
 from .forms import CreationForm, User
 
 
@@ -95,3 +99,22 @@ class UsersFormsTests(TestCase):
         self.assertTrue(
             User.objects.filter(username='testusermuser',).exists()
         )
+
+
+@override_settings(TASKS_EAGER=False)
+class PasswordResetTests(TestCase):
+    def test_reset_email_is_sent_by_worker(self):
+        '''Письмо для сброса пароля отправляет фоновая задача'''
+        User.objects.create_user(
+            username='forgetful', email='me@mail.ru', password='zaqwsx963'
+        )
+        response = Client().post(
+            reverse('password_reset'), {'email': 'me@mail.ru'}
+        )
+        self.assertRedirects(response, reverse('password_reset_done'))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Task.objects.get().name, 'users.tasks.send_email')
+        tasks.work('test', burst=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['me@mail.ru'])
+        self.assertIn('/auth/reset/', mail.outbox[0].body)
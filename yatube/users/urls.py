@@ -1,7 +1,10 @@
-from django.contrib.auth.views import LoginView, LogoutView
+from django.contrib.auth.views import (
+    LoginView, LogoutView, PasswordResetView
+)
 from django.urls import path
 
 from . import views
+from .forms import PasswordResetForm
 
 app_name = 'users'
 
@@ -26,5 +29,12 @@ urlpatterns = [
         LoginView.as_view(template_name='users/password_reset.html'),
         name='password_reset_form'
     ),
+    # заменяет одноименный адрес django.contrib.auth.urls:
+    # письмо со ссылкой отправляет фоновая задача
+    path(
+        'password_reset/',
+        PasswordResetView.as_view(form_class=PasswordResetForm),
+        name='password_reset'
+    ),
     # Здесь будет path('password_change',) позднее
 ]
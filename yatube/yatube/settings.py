@@ -29,10 +29,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestStatsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +43,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PersonalFragmentsMiddleware',
+    'core.middleware.SharedPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -47,7 +52,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.StatsDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -62,8 +67,27 @@ TEMPLATES = [
     },
 ]
 
+# Production-режим шаблонов: все шаблоны templates/ разбираются при старте,
+# хранятся в памяти, а простые include подставляются в них заранее
+PRECOMPILE_TEMPLATES = os.getenv(
+    'YATUBE_PRECOMPILE_TEMPLATES', '0' if DEBUG else '1'
+) == '1'
+if PRECOMPILE_TEMPLATES:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('core.template_loaders.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+ASGI_APPLICATION = 'yatube.asgi.application'
+# потоки, в которых ASGI-приложение выполняет представления; медленные
+# клиенты их не занимают
+ASGI_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
@@ -75,6 +99,23 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения лент: пути к копиям базы через запятую.
+# В тестах реплики смотрят в тестовую primary-базу
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_REPLICA_DBS', '').split(','))
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Сколько секунд после записи сессия читает только с primary
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -128,11 +169,95 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+COMMENTS_PER_PAGE = 20
+# Сколько строк выгрузка читает из базы за один запрос
+EXPORT_CHUNK_SIZE = 2000
+# Наибольший ?limit= страницы в API
+API_MAX_PAGE_SIZE = 100
+
+# Фрагменты лент сбрасываются сигналами, таймаут лишь подчищает старые ключи
+FEED_CACHE_TIMEOUT = 60 * 60
+# Общая для всех зрителей часть страниц лент кэшируется целиком; ее тоже
+# сбрасывают сигналы, сменой версии лент
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам
+# подписок, а дочитываются при показе ленты
+TIMELINE_FANOUT_MAX_FOLLOWERS = 5000
+# Ленты стольких подписчиков пополняются прямо в запросе, больше -
+# фоновой задачей
+TIMELINE_FANOUT_INLINE_FOLLOWERS = 100
+# Сколько последних постов автора копируется в ленту при подписке;
+# более старые дочитываются при показе ленты
+TIMELINE_BACKFILL_POSTS = 500
+# Сколько хранится в кэше множество авторов, на которых подписан
+# пользователь (подписка и отписка меняют его версию раньше)
+FOLLOWED_CACHE_TIMEOUT = 60 * 10
+
+# Миниатюры, которые готовятся сразу после загрузки изображения:
+# поле модели Post -> (геометрия, параметры sorl-thumbnail)
+THUMBNAIL_GEOMETRIES = {
+    'thumbnail_list': ('960x339', {'crop': 'center'}),
+    'thumbnail_detail': ('960x339', {'crop': 'center', 'upscale': True}),
 }
+# Потоки команд process_images и generate_thumbnails; 0 - без пула
+THUMBNAIL_WORKERS = 2
+
+# Ограничения загружаемых картинок: размер файла и число пикселей
+# (защита от «бомб», которые разворачиваются в гигабайты памяти)
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 50 * 1000 * 1000
+# Загрузки больше этого размера пишутся во временный файл по частям
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+# Загруженные картинки уменьшаются до этой длины большей стороны
+# и пережимаются в этот формат без метаданных
+IMAGE_MAX_SIDE = 1920
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 80
+
+# Фоновые задачи (обработка картинок, рассылка постов по лентам) ставятся
+# в очередь в таблице core_task, ее разбирает manage.py run_workers.
+# С YATUBE_TASKS_EAGER=1 (по умолчанию при DEBUG) очереди нет: задачи
+# выполняются после коммита в TASK_EAGER_THREADS потоках сервера
+TASKS_EAGER = os.getenv(
+    'YATUBE_TASKS_EAGER', '1' if DEBUG else '0'
+) == '1'
+TASK_EAGER_THREADS = 2
+# Процессы run_workers по умолчанию
+TASK_WORKER_PROCESSES = 2
+# Попытки упавшей задачи; пауза перед повтором удваивается с каждой
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+# Как часто свободный обработчик проверяет очередь, секунд
+TASK_POLL_INTERVAL = 1
+# Задача, которая выполняется дольше, считается брошенной и
+# возвращается в очередь
+TASK_TIMEOUT = 60 * 10
+# Сколько готовых задач обработчик перебирает, если первую забрал другой
+TASK_CLAIM_CANDIDATES = 10
+
+# Сколько результатов поиска ранжировать и показывать
+SEARCH_MAX_RESULTS = 1000
+# Сколько слов запроса учитывается при поиске
+SEARCH_MAX_TERMS = 10
+# Как долго число документов для TF-IDF берется из кэша, секунд
+SEARCH_DOCUMENTS_TIMEOUT = 60 * 60
+
+# Общий для процессов кэш в файле SQLite, если задан путь к нему
+CACHE_DATABASE = os.getenv('YATUBE_CACHE_DB')
+if CACHE_DATABASE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.StatsSQLiteCache',
+            'LOCATION': CACHE_DATABASE,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.StatsLocMemCache',
+        }
+    }
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
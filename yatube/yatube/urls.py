@@ -3,14 +3,20 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import request_stats_page
+
 handler403 = 'core.views.forbidden_error'
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 urlpatterns = [
+    path(
+        'admin/request-stats/', request_stats_page, name='request_stats'
+    ),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
 ]
 if settings.DEBUG: